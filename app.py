@@ -1,80 +1,1133 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template_string, request, jsonify, Response, stream_with_context, g, has_request_context
 import pickle
 import requests
 import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import time
+import resource
+import bisect
+import unicodedata
+import sqlite3
+import threading
+import hashlib
+import hmac
+import weakref
+import gzip
+from collections import OrderedDict, defaultdict, Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
+import pandas as pd
+from requests.adapters import HTTPAdapter
 from werkzeug.exceptions import RequestEntityTooLarge
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, bootstrap still works for a single process
+    fcntl = None
+try:
+    import brotli
+except ImportError:  # optional: responses are still gzipped without it
+    brotli = None
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Global variables to store loaded data
-movies = None
-similarity = None
+# Number of neighbors stored per movie in the precomputed index
+NEIGHBOR_K = int(os.environ.get('NEIGHBOR_K', 50))
+
+# Memory 'app.py build' may spend on similarity blocks, shared by all of its worker processes
+BUILD_MEMORY_MB = float(os.environ.get('BUILD_MEMORY_MB', 1024))
+# Peak bytes per similarity cell while a chunk is scored: the sparse product (value + column index),
+# its dense float32 copy and argpartition's int64 index array
+BUILD_BYTES_PER_CELL = 20
+
+# Limits for /api/recommend/batch
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 5000))
+MAX_BATCH_K = int(os.environ.get('MAX_BATCH_K', 100))
+BATCH_CHUNK_SIZE = 256
+
+# Limit for multi-seed (watch history) recommendations
+MAX_HISTORY_SIZE = int(os.environ.get('MAX_HISTORY_SIZE', 1000))
+
+# Neighbor engine: 'exact' serves the precomputed index, 'ann' queries an LSH index over movie vectors
+RECOMMEND_ENGINE = os.environ.get('RECOMMEND_ENGINE', 'exact')
+ANN_TABLES = int(os.environ.get('ANN_TABLES', 16))
+ANN_BITS = int(os.environ.get('ANN_BITS', 0))  # 0 picks a size from the catalog
+ANN_PROBE_RADIUS = int(os.environ.get('ANN_PROBE_RADIUS', 1))
+
+# Columnar, memory-mappable model artifacts (see write_artifacts)
+ARTIFACTS_DIR = os.environ.get('ARTIFACTS_DIR', 'artifacts')
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Each build/convert publishes ARTIFACTS_DIR/<version>/; the CURRENT file names the live one
+CURRENT_VERSION_FILE = "CURRENT"
+ARTIFACT_KEEP_VERSIONS = int(os.environ.get('ARTIFACT_KEEP_VERSIONS', 3))
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))  # 0 disables the watcher
+
+# Source pickles on Google Drive; GDRIVE_BASE_URL can point at a local file server
+GDRIVE_BASE_URL = os.environ.get('GDRIVE_BASE_URL', 'https://drive.google.com/uc')
+DOWNLOAD_TIMEOUT = float(os.environ.get('DOWNLOAD_TIMEOUT', 60))
+# Downloads are unpickled, so each one must match a known digest. No digest is pinned here yet, so a
+# fresh deploy downloads nothing until MOVIE_LIST_SHA256 and SIMILARITY_SHA256 are set (see render.yaml).
+# Get them from copies you trust with 'app.py checksum movie_list.pkl similarity.pkl', and either set
+# the env vars or pin the values in "sha256" below; the env vars override whatever is pinned.
+ARTIFACT_SOURCES = {
+    "movie_list.pkl": {"gdrive_id": "1oQzIf4RWUnDG43zannvii74BIYDH-aK5", "sha256": None, "sha256_env": 'MOVIE_LIST_SHA256'},
+    "similarity.pkl": {"gdrive_id": "1kbIwDxIk6OGgNrrEJbG3Tvis3F3OTM5Q", "sha256": None, "sha256_env": 'SIMILARITY_SHA256'},
+}
+for _source in ARTIFACT_SOURCES.values():
+    _source['sha256'] = os.environ.get(_source['sha256_env']) or _source['sha256']
+# Escape hatch for local experiments only: accept a download with no digest to check it against
+ALLOW_UNVERIFIED_DOWNLOADS = os.environ.get('ALLOW_UNVERIFIED_DOWNLOADS') == '1'
+BOOTSTRAP_LOCK_PATH = os.environ.get('BOOTSTRAP_LOCK_PATH', '.bootstrap.lock')
+
+# TMDB enrichment settings; TMDB_API_BASE can point at a local stub server
+TMDB_API_BASE = os.environ.get('TMDB_API_BASE', 'https://api.themoviedb.org/3').rstrip('/')
+TMDB_TIMEOUT = float(os.environ.get('TMDB_TIMEOUT', 10))
+TMDB_MAX_WORKERS = int(os.environ.get('TMDB_MAX_WORKERS', 16))
+ENRICHMENT_DEADLINE = float(os.environ.get('ENRICHMENT_DEADLINE', 4))
+# Batch jobs wait longer for posters but only use part of the pool, leaving the rest to interactive requests
+BATCH_ENRICHMENT_DEADLINE = float(os.environ.get('BATCH_ENRICHMENT_DEADLINE', 120))  # 0 waits for every lookup
+BATCH_ENRICHMENT_CONCURRENCY = int(os.environ.get('BATCH_ENRICHMENT_CONCURRENCY', max(1, TMDB_MAX_WORKERS // 2)))
+# Whole-request budget (seconds, 0 disables): enrichment gets whatever ranking left of it
+REQUEST_LATENCY_BUDGET = float(os.environ.get('REQUEST_LATENCY_BUDGET', 3))
+# Circuit breaker: stop calling TMDB after this many consecutive failed or slow calls
+TMDB_BREAKER_FAILURES = int(os.environ.get('TMDB_BREAKER_FAILURES', 5))
+TMDB_BREAKER_SLOW_CALL = float(os.environ.get('TMDB_BREAKER_SLOW_CALL', 2))
+TMDB_BREAKER_COOLDOWN = float(os.environ.get('TMDB_BREAKER_COOLDOWN', 30))
+
+# One keep-alive connection pool and one bounded thread pool shared by all requests
+tmdb_session = requests.Session()
+tmdb_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=TMDB_MAX_WORKERS))
+tmdb_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=TMDB_MAX_WORKERS))
+tmdb_executor = ThreadPoolExecutor(max_workers=TMDB_MAX_WORKERS, thread_name_prefix='tmdb')
+
+# Poster/rating cache: in-process LRU in front of a SQLite file shared by workers and restarts
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', 10000))
+METADATA_CACHE_TTL = float(os.environ.get('METADATA_CACHE_TTL', 7 * 24 * 3600))
+METADATA_NEGATIVE_TTL = float(os.environ.get('METADATA_NEGATIVE_TTL', 600))
+METADATA_CACHE_DB = os.environ.get('METADATA_CACHE_DB', 'tmdb_cache.sqlite3')
+
+class MetadataCache:
+    """Two-tier (memory LRU + SQLite) cache of (poster, rating) keyed by movie_id"""
+
+    def __init__(self, max_size=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL,
+                 negative_ttl=METADATA_NEGATIVE_TTL, db_path=METADATA_CACHE_DB):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'negative_hits': 0, 'misses': 0}
+
+    def _db(self):
+        """Return this thread's SQLite connection, creating the table on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tmdb_metadata ("
+                "movie_id INTEGER PRIMARY KEY, poster TEXT, rating TEXT, "
+                "negative INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, movie_id, entry):
+        with self._lock:
+            self._entries[movie_id] = entry
+            self._entries.move_to_end(movie_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get(self, movie_id):
+        """Return the cached (poster, rating) for movie_id, or None on a miss"""
+        movie_id = int(movie_id)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(movie_id)
+            if entry is not None:
+                if entry[3] > now:
+                    self._entries.move_to_end(movie_id)
+                    self.stats['negative_hits' if entry[2] else 'memory_hits'] += 1
+                    return entry[0], entry[1]
+                del self._entries[movie_id]
+
+        if self.db_path:
+            try:
+                row = self._db().execute(
+                    "SELECT poster, rating, negative, expires_at FROM tmdb_metadata WHERE movie_id = ?",
+                    (movie_id,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Metadata cache read failed: {e}")
+                row = None
+            if row is not None and row[3] > now:
+                entry = (row[0], json.loads(row[1]), bool(row[2]), row[3])
+                self._remember(movie_id, entry)
+                self._count('negative_hits' if entry[2] else 'disk_hits')
+                return entry[0], entry[1]
+
+        self._count('misses')
+        return None
+
+    def set(self, movie_id, poster, rating, negative=False):
+        """Store a lookup result; failures are kept for the shorter negative TTL"""
+        movie_id = int(movie_id)
+        expires_at = time.time() + (self.negative_ttl if negative else self.ttl)
+        self._remember(movie_id, (poster, rating, negative, expires_at))
+        if self.db_path:
+            try:
+                conn = self._db()
+                conn.execute(
+                    "INSERT OR REPLACE INTO tmdb_metadata VALUES (?, ?, ?, ?, ?)",
+                    (movie_id, poster, json.dumps(rating), int(negative), expires_at)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Metadata cache write failed: {e}")
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+metadata_cache = MetadataCache()
+
+# Serialized responses for repeat traffic, keyed by model version so a reload invalidates them
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2048))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_MAX_AGE = int(os.environ.get('RESPONSE_MAX_AGE', 60))  # Cache-Control max-age for GET endpoints
+COMPRESS_MIN_BYTES = 1024
+
+class ResponseCache:
+    """In-process LRU of prepared (pre-serialized, pre-compressed) response bodies with a TTL"""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] > time.time():
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+            self._entries.pop(key, None)
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, entry):
+        entry['expires_at'] = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+response_cache = ResponseCache()
+
+def prepare_response(body, content_type='application/json'):
+    """Serialize-once response entry: the body, its compressed variants and a strong ETag"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    entry = {'body': body, 'content_type': content_type, 'etag': hashlib.sha256(body).hexdigest()[:32], 'encodings': {}}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        entry['encodings']['gzip'] = gzip.compress(body, compresslevel=6)
+        if brotli is not None:
+            entry['encodings']['br'] = brotli.compress(body)
+    return entry
+
+def prepare_json(obj):
+    """prepare_response for a JSON payload, serialized exactly as jsonify would"""
+    return prepare_response(app.json.dumps(obj, separators=(',', ':')) + '\n')
+
+# Latency histograms (seconds) and counters, exported in Prometheus text format on /metrics
+METRIC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Opt-in sampling profiler: dump the stacks of requests slower than this many ms (0 disables)
+PROFILE_SLOW_REQUESTS_MS = float(os.environ.get('PROFILE_SLOW_REQUESTS_MS', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+class Metrics:
+    """Thread-safe per-process stage latency histograms and labelled counters"""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            position = bisect.bisect_left(self.buckets, seconds)
+            if position < len(self.buckets):
+                histogram['buckets'][position] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def summary(self):
+        """Compact per-stage count and mean latency for /health"""
+        with self._lock:
+            return {stage: {'count': h['count'], 'mean_ms': round(h['sum'] * 1000 / h['count'], 2)}
+                    for stage, h in self._histograms.items() if h['count']}
+
+    def render(self, gauges, counters=None):
+        """Prometheus text exposition of histograms, counters and the given gauges and extra counters"""
+        def labels(pairs):
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if pairs else ''
+
+        lines = ['# HELP cineai_stage_latency_seconds Latency of each request stage',
+                 '# TYPE cineai_stage_latency_seconds histogram']
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, h['buckets']):
+                    cumulative += count
+                    lines.append(f'cineai_stage_latency_seconds_bucket{labels([("stage", stage), ("le", bound)])} {cumulative}')
+                lines.append(f'cineai_stage_latency_seconds_bucket{labels([("stage", stage), ("le", "+Inf")])} {h["count"]}')
+                lines.append(f'cineai_stage_latency_seconds_sum{labels([("stage", stage)])} {h["sum"]}')
+                lines.append(f'cineai_stage_latency_seconds_count{labels([("stage", stage)])} {h["count"]}')
+
+            seen = set()
+            for (name, pairs), value in sorted(self._counters.items()):
+                if name not in seen:
+                    lines.append(f'# TYPE cineai_{name} counter')
+                    seen.add(name)
+                lines.append(f'cineai_{name}{labels(pairs)} {value}')
 
-def download_from_gdrive(file_id, destination):
-    """Download file from Google Drive using direct download link"""
+        for name, value in (counters or {}).items():
+            lines.append(f'# TYPE cineai_{name} counter')
+            lines.append(f'cineai_{name} {value}')
+        for name, value in gauges.items():
+            lines.append(f'# TYPE cineai_{name} gauge')
+            lines.append(f'cineai_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+@contextmanager
+def timed(stage):
+    """Record the wall time of a block (or, as a decorator, a function) under stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(stage, time.perf_counter() - started)
+
+def process_rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS, but better than nothing off Linux
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+class SamplingProfiler:
+    """Periodically samples one thread's Python stack and aggregates identical stacks"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='profiler')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Write the samples in collapsed-stack format (one 'frame;frame;frame count' per line)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution whose result every caller shares"""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+
+        if not leader:
+            metrics.inc('singleflight_coalesced_total', group=self.name)
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn(*args, **kwargs)
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failed or slow calls; after a cooldown one half-open probe decides"""
+
+    STATES = ('closed', 'half_open', 'open')
+
+    def __init__(self, name, failure_threshold, slow_call_seconds, cooldown):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now; callers that get True must report back through record()"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._transition('half_open')
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record(self, ok, elapsed):
+        failed = not ok or elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+                self._transition('open' if failed else 'closed')
+            elif self.state == 'closed':
+                self._failures = self._failures + 1 if failed else 0
+                if self._failures >= self.failure_threshold:
+                    self._transition('open')
+
+    def _transition(self, state):
+        self.state = state
+        self._failures = 0
+        if state == 'open':
+            self._opened_at = time.monotonic()
+        metrics.inc('circuit_breaker_transitions_total', breaker=self.name, state=state)
+        print(f"Circuit breaker {self.name} is now {state}")
+
+tmdb_breaker = CircuitBreaker('tmdb', TMDB_BREAKER_FAILURES, TMDB_BREAKER_SLOW_CALL, TMDB_BREAKER_COOLDOWN)
+# Identical lookups already in flight are joined rather than repeated
+tmdb_flight = SingleFlight('tmdb')
+recommend_flight = SingleFlight('recommend')
+
+# Only interactive /api/recommend calls pass this as their deadline: a long streaming response
+# such as the batch endpoint would hit the floor for everything after its first chunk
+def remaining_budget(cap=ENRICHMENT_DEADLINE):
+    """Seconds left of the current request's latency budget, never more than cap"""
+    started = g.get('request_started') if has_request_context() else None
+    if started is None or REQUEST_LATENCY_BUDGET <= 0:
+        return cap
+    # Keep a sliver so answers already in the memory cache still make it in
+    return max(0.05, min(cap, REQUEST_LATENCY_BUDGET - (time.perf_counter() - started)))
+
+def normalize_title(title):
+    """Casefold a title and collapse whitespace so lookups ignore case and spacing"""
+    return ' '.join(unicodedata.normalize('NFKC', str(title)).casefold().split())
+
+class TitleIndex:
+    """Title search built once at load time: exact map, sorted prefix keys and an n-gram index"""
+
+    NGRAM_SIZES = (1, 2, 3)
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+        self.normalized = [normalize_title(title) for title in self.titles]
+
+        self.exact = {}
+        for i, key in enumerate(self.normalized):
+            self.exact.setdefault(key, []).append(i)
+
+        order = sorted(range(len(self.normalized)), key=lambda i: (self.normalized[i], i))
+        self.sorted_keys = [self.normalized[i] for i in order]
+        self.sorted_ids = order
+
+        postings = defaultdict(list)
+        for i, key in enumerate(self.normalized):
+            for gram in {key[j:j + n] for n in self.NGRAM_SIZES for j in range(len(key) - n + 1)}:
+                postings[gram].append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def _substring_candidates(self, query):
+        """Yield ids that may contain query, in catalog order"""
+        n = min(len(query), max(self.NGRAM_SIZES))
+        grams = sorted({query[j:j + n] for j in range(len(query) - n + 1)},
+                       key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = self.postings.get(grams[0])
+        if candidates is None:
+            return
+        for gram in grams[1:]:
+            candidates = np.intersect1d(candidates, self.postings[gram], assume_unique=True)
+            if len(candidates) == 0:
+                return
+        for i in candidates:
+            yield int(i)
+
+    def search(self, query, limit=20):
+        """Return up to limit title ids ranked exact match, then prefix, then substring"""
+        query = normalize_title(query)
+        if not query or limit <= 0:
+            return []
+
+        results = list(self.exact.get(query, []))[:limit]
+        seen = set(results)
+
+        lo = bisect.bisect_left(self.sorted_keys, query)
+        for pos in range(lo, len(self.sorted_keys)):
+            if len(results) >= limit or not self.sorted_keys[pos].startswith(query):
+                break
+            i = self.sorted_ids[pos]
+            if i not in seen:
+                results.append(i)
+                seen.add(i)
+
+        if len(results) < limit:
+            for i in self._substring_candidates(query):
+                if i not in seen and query in self.normalized[i]:
+                    results.append(i)
+                    seen.add(i)
+                    if len(results) >= limit:
+                        break
+
+        return results
+
+    def resolve(self, query):
+        """Return the id of the best match for a title, or None"""
+        matches = self.search(query, limit=1)
+        return matches[0] if matches else None
+
+# The model snapshot serving requests; replaced wholesale on reload, never mutated
+active_model = None
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def download_from_gdrive(file_id, destination, sha256=None, progress=None):
+    """Download a file from Google Drive, resuming a partial download and verifying its checksum"""
+    partial = destination + '.part'
     try:
         # Use the direct download URL format for Google Drive
-        url = f"https://drive.google.com/uc?id={file_id}&export=download"
+        url = f"{GDRIVE_BASE_URL}?id={file_id}&export=download"
         
-        print(f"Downloading {destination} from Google Drive...")
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        print(f"Downloading {destination} from Google Drive" + (f" (resuming at {offset} bytes)..." if offset else "..."))
         
         session = requests.Session()
-        response = session.get(url, stream=True)
+        response = session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
         
-        # Handle the case where Google Drive asks for confirmation for large files
-        if 'confirm' in response.text:
-            # Extract confirmation token
+        # Google Drive answers large files with an HTML confirmation page instead of the file
+        if 'text/html' in response.headers.get('Content-Type', ''):
+            confirm_token = None
             for line in response.text.split('\n'):
                 if 'confirm=' in line:
                     confirm_token = line.split('confirm=')[1].split('&')[0]
                     break
+            if confirm_token is None:
+                print(f"Failed to download {destination}: unexpected HTML response")
+                return False
             
             # Retry with confirmation token
-            url = f"https://drive.google.com/uc?id={file_id}&export=download&confirm={confirm_token}"
-            response = session.get(url, stream=True)
+            url = f"{GDRIVE_BASE_URL}?id={file_id}&export=download&confirm={confirm_token}"
+            response = session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
         
-        if response.status_code == 200:
-            with open(destination, "wb") as f:
-                for chunk in response.iter_content(chunk_size=32768):
-                    if chunk:
-                        f.write(chunk)
-            print(f"Successfully downloaded {destination}")
-            return True
+        if response.status_code == 206:
+            mode = 'ab'
+        elif response.status_code == 200:
+            # The server ignored the Range header, so start over
+            mode, offset = 'wb', 0
+        elif response.status_code == 416 and offset:
+            # Nothing left to fetch; the partial file is already complete
+            mode = None
         else:
             print(f"Failed to download {destination}. Status code: {response.status_code}")
             return False
+
+        if mode is not None:
+            length = response.headers.get('Content-Length')
+            total = offset + int(length) if length else None
+            with open(partial, mode) as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    if chunk:
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if progress:
+                            progress(offset, total)
+
+        if sha256:
+            actual = file_sha256(partial)
+            if actual != sha256.lower():
+                os.remove(partial)
+                print(f"Checksum mismatch for {destination}: expected {sha256}, got {actual}")
+                return False
+
+        os.replace(partial, destination)
+        print(f"Successfully downloaded {destination}")
+        return True
             
     except Exception as e:
         print(f"Error downloading {destination}: {str(e)}")
         return False
 
-def load_data():
-    """Load pickle files on app startup"""
-    global movies, similarity
+def download_missing_pickles(progress=None):
+    """Download every missing source pickle in parallel; True when all of them are present"""
+    missing = [name for name in ARTIFACT_SOURCES if not os.path.exists(name)]
+    if not missing:
+        return True
+
+    def fetch(name):
+        source = ARTIFACT_SOURCES[name]
+        if not source['sha256'] and not ALLOW_UNVERIFIED_DOWNLOADS:
+            print(f"Refusing to download {name} without a checksum to verify it against; "
+                  f"set {source['sha256_env']} (or ALLOW_UNVERIFIED_DOWNLOADS=1 for local testing)")
+            return False
+        report = (lambda done, total: progress(name, done, total)) if progress else None
+        return download_from_gdrive(source['gdrive_id'], name, sha256=source['sha256'], progress=report)
+
+    with ThreadPoolExecutor(max_workers=len(missing), thread_name_prefix='download') as pool:
+        return all(pool.map(fetch, missing))
+
+@contextmanager
+def host_lock(path=BOOTSTRAP_LOCK_PATH):
+    """Exclusive lock shared by every process on this host (a no-op where fcntl is unavailable)"""
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def top_k(rows, k, overwrite=False):
+    """Return (ids, scores) of the k largest entries per row, best first; overwrite lets it clobber rows"""
+    rows = np.asarray(rows)
+    k = min(k, rows.shape[1])
+    if k <= 0:
+        empty = np.empty((rows.shape[0], 0))
+        return empty.astype(np.int32), empty.astype(rows.dtype)
+    if k < rows.shape[1]:
+        # Partition the negated block for the k smallest: asking for the k largest directly is
+        # several times slower on rows that are mostly equal zeros. Negating in place avoids a copy.
+        negated = np.negative(rows, out=rows) if overwrite else -rows
+        ids = np.argpartition(negated, k - 1, axis=1)[:, :k]
+        scores = -np.take_along_axis(negated, ids, axis=1)
+    else:
+        ids = np.tile(np.arange(rows.shape[1]), (rows.shape[0], 1))
+        scores = np.take_along_axis(rows, ids, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+def build_neighbor_index(similarity, k=NEIGHBOR_K, chunk_size=1024):
+    """Derive a top-K neighbor index (int32 ids, float16 scores) from a dense similarity matrix"""
+    n = similarity.shape[0]
+    k = max(0, min(k, n - 1))
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        rows = np.array(similarity[start:end], dtype=np.float32)
+        # A movie is never its own recommendation
+        rows[np.arange(end - start), np.arange(start, end)] = -np.inf
+        chunk_ids, chunk_scores = top_k(rows, k, overwrite=True)
+        ids[start:end] = chunk_ids
+        scores[start:end] = chunk_scores
+
+    return ids, scores
+
+class LSHIndex:
+    """Random-hyperplane LSH over L2-normalized movie vectors for sublinear top-K queries"""
+
+    def __init__(self, vectors, num_tables=ANN_TABLES, num_bits=ANN_BITS,
+                 probe_radius=ANN_PROBE_RADIUS, seed=0):
+        n, dim = vectors.shape
+        # Aim for roughly 32 movies per bucket
+        num_bits = num_bits or int(np.clip(np.round(np.log2(max(n, 2) / 32)), 4, 30))
+        self.vectors = vectors
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.probe_radius = probe_radius
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((dim, num_tables * num_bits)).astype(np.float32)
+        self.bit_values = (1 << np.arange(num_bits)).astype(np.int64)
+
+        self.codes = np.empty((n, num_tables), dtype=np.int64)
+        for start in range(0, n, 65536):
+            self.codes[start:start + 65536] = self._hash(vectors[start:start + 65536])
+        # One sorted code column per table; a bucket is a searchsorted range
+        self.order = np.argsort(self.codes.T, axis=1, kind='stable')
+        self.sorted_codes = np.take_along_axis(self.codes.T, self.order, axis=1)
+
+    def _hash(self, rows):
+        projected = np.asarray(rows @ self.planes)
+        bits = (projected > 0).reshape(len(projected), self.num_tables, self.num_bits)
+        return bits.astype(np.int64) @ self.bit_values
+
+    def candidates(self, index):
+        """Ids sharing a bucket (or, with probing, a 1-bit-away bucket) with movie index"""
+        found = []
+        for table, code in enumerate(self.codes[index]):
+            keys = [code]
+            if self.probe_radius:
+                keys += [code ^ bit for bit in self.bit_values.tolist()]
+            keys = np.array(keys, dtype=np.int64)
+            lo = np.searchsorted(self.sorted_codes[table], keys, side='left')
+            hi = np.searchsorted(self.sorted_codes[table], keys, side='right')
+            found.extend(self.order[table, a:b] for a, b in zip(lo, hi) if b > a)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.sort(np.concatenate(found))
+        keep = np.ones(len(candidates), dtype=bool)
+        keep[1:] = candidates[1:] != candidates[:-1]
+        candidates = candidates[keep]
+        return candidates[candidates != index]
+
+    def query(self, index, k):
+        """Approximate top-k (ids, scores) for movie index, rescored with exact cosine"""
+        candidates = self.candidates(index)
+        if len(candidates) < k:
+            # Too few collisions to fill the answer; score the whole catalog instead
+            candidates = np.delete(np.arange(self.vectors.shape[0]), index)
+        query = self.vectors[index].toarray().ravel()
+        scores = np.asarray(self.vectors[candidates] @ query, dtype=np.float32)
+        ids, top_scores = top_k(scores[None, :], k)
+        return candidates[ids[0]], top_scores[0]
+
+def exact_top_k(vectors, indices, k, chunk_size=256):
+    """Brute-force top-k (ids, scores) for the given rows, used to measure ANN recall"""
+    indices = np.asarray(indices)
+    all_ids, all_scores = [], []
+    for start in range(0, len(indices), chunk_size):
+        chunk = indices[start:start + chunk_size]
+        rows = (vectors[chunk] @ vectors.T).toarray().astype(np.float32, copy=False)
+        rows[np.arange(len(chunk)), chunk] = -np.inf
+        ids, scores = top_k(rows, k, overwrite=True)
+        all_ids.append(ids)
+        all_scores.append(scores)
+    return np.concatenate(all_ids), np.concatenate(all_scores)
+
+def evaluate_ann(ann, k=10, sample=200, seed=0):
+    """Compare ANN answers with exact ones on a sample of movies: recall@k and per-query latency"""
+    n = ann.vectors.shape[0]
+    indices = np.random.default_rng(seed).choice(n, size=min(sample, n), replace=False)
+
+    started = time.time()
+    exact_ids, _ = exact_top_k(ann.vectors, indices, k)
+    exact_ms = (time.time() - started) * 1000 / len(indices)
+
+    started = time.time()
+    ann_ids = [ann.query(index, k)[0] for index in indices]
+    ann_ms = (time.time() - started) * 1000 / len(indices)
+
+    hits = sum(len(np.intersect1d(ids, exact)) for ids, exact in zip(ann_ids, exact_ids))
+    candidates = sum(len(ann.candidates(index)) for index in indices)
+
+    return {
+        'k': k,
+        'sample': len(indices),
+        'tables': ann.num_tables,
+        'bits': ann.num_bits,
+        'probe_radius': ann.probe_radius,
+        f'recall@{k}': round(hits / (len(indices) * k), 4),
+        'mean_candidates': round(candidates / len(indices), 1),
+        'exact_ms_per_query': round(exact_ms, 3),
+        'ann_ms_per_query': round(ann_ms, 3),
+    }
+
+def load_vectors(arrays, manifest):
+    """Rebuild the sparse movie vectors from mapped CSR arrays, or None if they were not built"""
+    if 'vectors_data' not in arrays:
+        return None
+    from scipy import sparse
+    return sparse.csr_matrix((arrays['vectors_data'], arrays['vectors_indices'], arrays['vectors_indptr']),
+                             shape=tuple(manifest['vectors_shape']), copy=False)
+
+def staging_dir_for(out_dir):
+    """Create an empty directory inside the artifacts root to assemble a new version in"""
+    os.makedirs(out_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix='.staging-', dir=out_dir)
+
+def new_version_id():
+    """Sortable, unique artifact version name"""
+    return time.strftime('%Y%m%d-%H%M%S') + '-' + os.urandom(3).hex()
+
+def list_versions(out_dir):
+    """Published artifact versions under out_dir, oldest first"""
+    if not os.path.isdir(out_dir):
+        return []
+    return sorted(name for name in os.listdir(out_dir)
+                  if not name.startswith('.') and os.path.exists(os.path.join(out_dir, name, MANIFEST_NAME)))
+
+def set_current_version(out_dir, version):
+    """Point CURRENT at version with an atomic rename, so readers never see a partial file"""
+    tmp_path = os.path.join(out_dir, f'.{CURRENT_VERSION_FILE}.{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(out_dir, CURRENT_VERSION_FILE))
+
+def resolve_artifact_dir(out_dir):
+    """Return (version, path) of the live artifacts under out_dir, or (None, None)"""
     try:
-        # File paths
-        movie_list_path = "movie_list.pkl"
-        similarity_path = "similarity.pkl"
-        
-        # Google Drive file IDs from your shared links
-        MOVIE_LIST_GDRIVE_ID = "1oQzIf4RWUnDG43zannvii74BIYDH-aK5"  # movie_list.pkl
-        SIMILARITY_GDRIVE_ID = "1kbIwDxIk6OGgNrrEJbG3Tvis3F3OTM5Q"  # similarity.pkl
-        
-        # Download files if they don't exist
-        if not os.path.exists(movie_list_path):
-            print("Downloading movie_list.pkl...")
-            if not download_from_gdrive(MOVIE_LIST_GDRIVE_ID, movie_list_path):
-                print("Failed to download movie_list.pkl")
-                return False
-        
-        if not os.path.exists(similarity_path):
-            print("Downloading similarity.pkl...")
-            if not download_from_gdrive(SIMILARITY_GDRIVE_ID, similarity_path):
-                print("Failed to download similarity.pkl")
-                return False
-        
-        # Load the files
+        with open(os.path.join(out_dir, CURRENT_VERSION_FILE)) as f:
+            version = f.read().strip()
+        path = os.path.join(out_dir, version)
+        if version and os.path.exists(os.path.join(path, MANIFEST_NAME)):
+            return version, path
+    except OSError:
+        pass
+    # Unversioned layout written by older releases
+    if os.path.exists(os.path.join(out_dir, MANIFEST_NAME)):
+        return 'legacy', out_dir
+    return None, None
+
+def prune_versions(out_dir, keep=ARTIFACT_KEEP_VERSIONS):
+    """Delete all but the newest keep versions; mapped files stay valid for processes still using them"""
+    current, _ = resolve_artifact_dir(out_dir)
+    versions = list_versions(out_dir)
+    for version in versions[:max(0, len(versions) - keep)]:
+        if version != current:
+            shutil.rmtree(os.path.join(out_dir, version), ignore_errors=True)
+
+def publish_artifacts(staging_dir, out_dir, titles, movie_ids, extra=None):
+    """Add titles, ids and a manifest to staging_dir, then publish it as the new current version"""
+    # Titles are stored as one UTF-8 buffer plus N+1 offsets
+    encoded = [str(title).encode('utf-8') for title in titles]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    np.save(os.path.join(staging_dir, 'titles.npy'), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(os.path.join(staging_dir, 'title_offsets.npy'), offsets)
+    np.save(os.path.join(staging_dir, 'movie_ids.npy'), np.asarray(movie_ids, dtype=np.int64))
+
+    files = {}
+    for file_name in sorted(os.listdir(staging_dir)):
+        if file_name.endswith('.npy'):
+            array = np.load(os.path.join(staging_dir, file_name), mmap_mode='r')
+            files[file_name[:-4]] = {'file': file_name, 'dtype': str(array.dtype), 'shape': list(array.shape)}
+
+    version = new_version_id()
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'num_movies': len(encoded),
+        'neighbor_k': files['neighbor_ids']['shape'][1],
+        'files': files,
+    }
+    manifest.update(extra or {})
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(staging_dir, os.path.join(out_dir, version))
+    set_current_version(out_dir, version)
+    prune_versions(out_dir)
+    return manifest
+
+def write_artifacts(out_dir, titles, movie_ids, neighbor_ids, neighbor_scores, similarity=None):
+    """Write the model as flat .npy buffers plus a manifest, published as a new version in out_dir"""
+    staging_dir = staging_dir_for(out_dir)
+    try:
+        np.save(os.path.join(staging_dir, 'neighbor_ids.npy'), np.asarray(neighbor_ids, dtype=np.int32))
+        np.save(os.path.join(staging_dir, 'neighbor_scores.npy'), np.asarray(neighbor_scores, dtype=np.float16))
+        if similarity is not None:
+            np.save(os.path.join(staging_dir, 'similarity.npy'), np.asarray(similarity, dtype=np.float32))
+        return publish_artifacts(staging_dir, out_dir, titles, movie_ids)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+def load_artifacts(artifacts_dir):
+    """Memory-map the artifact arrays read-only so workers share pages via the OS page cache"""
+    with open(os.path.join(artifacts_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, info in manifest['files'].items():
+        array = np.load(os.path.join(artifacts_dir, info['file']), mmap_mode='r')
+        if list(array.shape) != info['shape']:
+            raise ValueError(f"{info['file']} has shape {array.shape}, expected {info['shape']}")
+        arrays[name] = array
+
+    num_movies = manifest['num_movies']
+    if len(arrays['movie_ids']) != num_movies or arrays['neighbor_ids'].shape[0] != num_movies:
+        raise ValueError("Artifact arrays do not match the manifest movie count")
+
+    buffer = arrays.pop('titles')
+    offsets = arrays.pop('title_offsets')
+    arrays['titles'] = [bytes(buffer[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(num_movies)]
+    return manifest, arrays
+
+def convert_pickles(movie_list_path="movie_list.pkl", similarity_path="similarity.pkl",
+                    out_dir=ARTIFACTS_DIR, include_similarity=True, k=NEIGHBOR_K):
+    """Convert the legacy pickles into the memory-mappable artifact format"""
+    with open(movie_list_path, 'rb') as f:
+        movie_list = pickle.load(f)
+    with open(similarity_path, 'rb') as f:
+        sim = pickle.load(f)
+
+    ids, scores = build_neighbor_index(sim, k=k)
+    return write_artifacts(out_dir, movie_list['title'].tolist(), movie_list['movie_id'].to_numpy(),
+                           ids, scores, similarity=sim if include_similarity else None)
+
+def prepare_tags(frame, credits=None):
+    """Return movie_id/title/tags, deriving tags from raw TMDB metadata when needed"""
+    if 'tags' in frame.columns:
+        return frame[['movie_id', 'title', 'tags']].dropna().reset_index(drop=True)
+
+    frame = frame.rename(columns={'id': 'movie_id'})
+    if credits is not None:
+        credits = credits.rename(columns={'id': 'movie_id'}).drop(columns=['title'], errors='ignore')
+        frame = frame.merge(credits, on='movie_id')
+
+    def names(value, limit=None, job=None):
+        # TMDB list columns are JSON arrays of {"name": ...}; multi-word names become one token
+        try:
+            items = json.loads(value) if isinstance(value, str) else []
+        except ValueError:
+            return []
+        if job is not None:
+            items = [item for item in items if item.get('job') == job]
+        return [item['name'].replace(' ', '') for item in items[:limit] if 'name' in item]
+
+    tags = []
+    for _, row in frame.iterrows():
+        words = str(row.get('overview', '') or '').split()
+        words += names(row.get('genres')) + names(row.get('keywords'))
+        words += names(row.get('cast'), limit=3) + names(row.get('crew'), job='Director')
+        tags.append(' '.join(words).lower())
+
+    frame = frame.assign(tags=tags)
+    return frame[['movie_id', 'title', 'tags']].dropna().reset_index(drop=True)
+
+# Sparse, L2-normalized tag vectors (and optional LSH index) shared with build workers
+_build_vectors = None
+_build_ann = None
+
+def _init_build_worker(vectors, ann=None):
+    global _build_vectors, _build_ann
+    _build_vectors = vectors
+    _build_ann = ann
+
+def _build_chunk(task):
+    """Cosine similarity of rows [start, end) against every movie, reduced to top-K"""
+    start, end, k = task
+    if _build_ann is not None:
+        results = [_build_ann.query(index, k) for index in range(start, end)]
+        return (start, np.array([ids for ids, _ in results], dtype=np.int32).reshape(-1, k),
+                np.array([scores for _, scores in results], dtype=np.float16).reshape(-1, k))
+    rows = (_build_vectors[start:end] @ _build_vectors.T).toarray().astype(np.float32, copy=False)
+    rows[np.arange(end - start), np.arange(start, end)] = -np.inf
+    ids, scores = top_k(rows, k, overwrite=True)
+    return start, ids.astype(np.int32), scores.astype(np.float16)
+
+def peak_memory_mb():
+    """Peak RSS of this process and of its waited-for children, in MB"""
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return round(own, 1), round(children, 1)
+
+def build_artifacts(source, out_dir=ARTIFACTS_DIR, credits=None, k=NEIGHBOR_K, chunk_size=None,
+                    workers=None, max_features=5000, engine='exact', memory_mb=BUILD_MEMORY_MB):
+    """Build serving artifacts from raw metadata without ever materializing the N x N matrix"""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    started = time.time()
+    if source.endswith('.pkl'):
+        with open(source, 'rb') as f:
+            frame = pickle.load(f)
+    else:
+        frame = pd.read_csv(source)
+    credits_frame = pd.read_csv(credits) if credits else None
+    frame = prepare_tags(frame, credits_frame)
+
+    vectorizer = CountVectorizer(max_features=max_features, stop_words='english')
+    vectors = normalize(vectorizer.fit_transform(frame['tags']).astype(np.float32)).tocsr()
+    n = vectors.shape[0]
+    k = max(0, min(k, n - 1))
+    # Split one memory budget across every worker's similarity block; rather than shrink
+    # chunks below 16 rows, run fewer workers
+    cells = int(memory_mb * 1024 * 1024) // BUILD_BYTES_PER_CELL
+    requested = workers
+    workers = max(1, min(workers or os.cpu_count() or 1, cells // (16 * max(n, 1))))
+    if requested and workers < requested:
+        print(f"Using {workers} of the {requested} requested workers: a {memory_mb:g} MB budget fits no more "
+              f"16-row similarity blocks; raise --memory-mb to run more")
+    chunk_size = chunk_size or max(16, min(4096, cells // (workers * max(n, 1))))
+    print(f"Vectorized {n} movies into {vectors.shape[1]} features; "
+          f"scoring {chunk_size}-row chunks on {workers} workers ({engine})")
+    # With the ANN engine each row only rescans its LSH candidates instead of the whole catalog
+    ann = LSHIndex(vectors) if engine == 'ann' else None
+
+    staging_dir = staging_dir_for(out_dir)
+    try:
+        ids = np.lib.format.open_memmap(os.path.join(staging_dir, 'neighbor_ids.npy'),
+                                        mode='w+', dtype=np.int32, shape=(n, k))
+        scores = np.lib.format.open_memmap(os.path.join(staging_dir, 'neighbor_scores.npy'),
+                                           mode='w+', dtype=np.float16, shape=(n, k))
+        tasks = [(start, min(start + chunk_size, n), k) for start in range(0, n, chunk_size)]
+
+        done = 0
+        report_every = max(1, n // 10)
+
+        def store(finished):
+            nonlocal done
+            for future in finished:
+                start, chunk_ids, chunk_scores = future.result()
+                ids[start:start + len(chunk_ids)] = chunk_ids
+                scores[start:start + len(chunk_ids)] = chunk_scores
+                if (done + len(chunk_ids)) // report_every > done // report_every:
+                    print(f"  {done + len(chunk_ids)}/{n} rows scored")
+                done += len(chunk_ids)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                                 initargs=(vectors, ann)) as pool:
+            # Keep a bounded window of chunks in flight so results never pile up in memory
+            pending = set()
+            for task in tasks:
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    store(finished)
+                pending.add(pool.submit(_build_chunk, task))
+            store(wait(pending)[0])
+        ids.flush()
+        scores.flush()
+        del ids, scores
+
+        # Keep the sparse vectors so the ANN engine can query them at serving time
+        np.save(os.path.join(staging_dir, 'vectors_data.npy'), vectors.data)
+        np.save(os.path.join(staging_dir, 'vectors_indices.npy'), vectors.indices)
+        np.save(os.path.join(staging_dir, 'vectors_indptr.npy'), vectors.indptr)
+
+        elapsed = time.time() - started
+        own_mb, children_mb = peak_memory_mb()
+        build_stats = {'seconds': round(elapsed, 1), 'peak_rss_mb': own_mb, 'peak_worker_rss_mb': children_mb,
+                       'workers': workers, 'chunk_size': chunk_size, 'engine': engine}
+        manifest = publish_artifacts(staging_dir, out_dir, frame['title'].tolist(), frame['movie_id'].to_numpy(),
+                                     extra={'build': build_stats, 'vectors_shape': list(vectors.shape)})
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    print(f"Built top-{k} neighbors for {n} movies in {elapsed:.1f}s "
+          f"(peak RSS {own_mb} MB, workers {children_mb} MB)")
+    return manifest
+
+class Model:
+    """Everything a request needs from one artifact version; treated as read-only once built"""
+
+    def __init__(self, version, movies, neighbor_ids, neighbor_scores, similarity=None, vectors=None,
+                 artifact_bytes=0):
+        # Recommendations index rows by position, so drop any custom DataFrame index
+        self.version = version
+        self.movies = movies.reset_index(drop=True)
+        self.titles = self.movies['title'].to_numpy()
+        self.movie_ids = self.movies['movie_id'].to_numpy()
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+        self.similarity = similarity
+        self.vectors = vectors
+        self.artifact_bytes = artifact_bytes
+        self.loaded_at = time.time()
+        self.title_index = TitleIndex(self.movies['title'].tolist())
+        self.movie_id_order = np.argsort(self.movie_ids, kind='stable')
+
+        self.ann_index = None
+        if RECOMMEND_ENGINE == 'ann':
+            if vectors is None:
+                print("Warning: the ANN engine needs artifacts from 'app.py build'; using the exact engine")
+            else:
+                self.ann_index = LSHIndex(vectors)
+                print(f"Built LSH index ({self.ann_index.num_tables} tables x {self.ann_index.num_bits} bits)")
+
+    @classmethod
+    def from_artifacts(cls, path):
+        manifest, arrays = load_artifacts(path)
+        size = sum(os.path.getsize(os.path.join(path, info['file'])) for info in manifest['files'].values())
+        # Only the small title/id columns live on the heap; the big arrays stay mapped
+        movies = pd.DataFrame({'movie_id': arrays['movie_ids'], 'title': arrays['titles']})
+        return cls(manifest.get('version', 'legacy'), movies, arrays['neighbor_ids'], arrays['neighbor_scores'],
+                   similarity=arrays.get('similarity'), vectors=load_vectors(arrays, manifest),
+                   artifact_bytes=size)
+
+    @classmethod
+    def from_pickles(cls, movie_list_path, similarity_path):
         print("Loading movie data...")
         with open(movie_list_path, 'rb') as f:
             movies = pickle.load(f)
@@ -82,24 +1135,229 @@ def load_data():
         print("Loading similarity data...")
         with open(similarity_path, 'rb') as f:
             similarity = pickle.load(f)
+
+        print(f"Building top-{NEIGHBOR_K} neighbor index...")
+        ids, scores = build_neighbor_index(similarity)
+        size = os.path.getsize(movie_list_path) + os.path.getsize(similarity_path)
+        return cls('pickle', movies, ids, scores, similarity=similarity, artifact_bytes=size)
+
+    def validate(self):
+        """Raise ValueError if the snapshot is not safe to serve"""
+        n = len(self.movies)
+        if n == 0:
+            raise ValueError("Model has no movies")
+        if self.neighbor_ids.shape != self.neighbor_scores.shape or self.neighbor_ids.shape[0] != n:
+            raise ValueError("Neighbor index does not match the movie list")
+        sample = np.asarray(self.neighbor_ids[:min(n, 1000)])
+        if sample.size and (sample.min() < 0 or sample.max() >= n):
+            raise ValueError("Neighbor index points outside the movie list")
+        if self.title_index.resolve(str(self.titles[0])) is None:
+            raise ValueError("Title index cannot resolve a known title")
+
+model_reload_lock = threading.Lock()
+
+def reload_model(version=None, force=False):
+    """Load an artifact version (default: CURRENT), validate it and atomically swap it in"""
+    global active_model
+    with model_reload_lock:
+        if version is None:
+            version, path = resolve_artifact_dir(ARTIFACTS_DIR)
+            if path is None:
+                raise FileNotFoundError(f"No model artifacts in {ARTIFACTS_DIR}")
+        else:
+            path = os.path.join(ARTIFACTS_DIR, version)
+            # Only names list_versions publishes, so '..' or a path cannot reach outside the root
+            if version not in list_versions(ARTIFACTS_DIR):
+                raise FileNotFoundError(f"Unknown model version {version}")
+
+        previous = active_model
+        if not force and previous is not None and previous.version == version:
+            return previous
+
+        print(f"Loading model version {version} from {path}...")
+        model = Model.from_artifacts(path)
+        model.validate()
+        if resolve_artifact_dir(ARTIFACTS_DIR)[0] != version:
+            set_current_version(ARTIFACTS_DIR, version)
+
+        # A single reference assignment: requests already holding the old snapshot finish on it
+        active_model = model
+        if previous is not None:
+            # Logged once the last in-flight request using the old snapshot lets go of it
+            weakref.finalize(previous, print, f"Released model version {previous.version}")
+        metrics.inc('model_reloads_total')
+        print(f"Serving model version {version} ({len(model.movies)} movies)"
+              + (f", replacing {previous.version}" if previous is not None else ""))
+        return model
+
+@timed('load_data')
+def load_data():
+    """Load model artifacts on app startup, falling back to the pickle files"""
+    global active_model
+    try:
+        if resolve_artifact_dir(ARTIFACTS_DIR)[1] is not None:
+            try:
+                model = reload_model(force=True)
+                print(f"Loaded {len(model.movies)} movies successfully!")
+                return True
+            except Exception as e:
+                print(f"Error loading artifacts, falling back to pickle files: {e}")
+
+        # File paths
+        movie_list_path = "movie_list.pkl"
+        similarity_path = "similarity.pkl"
+        
+        # Download files if they don't exist
+        if not download_missing_pickles():
+            print("Failed to download the model pickles")
+            return False
         
-        print(f"Loaded {len(movies)} movies successfully!")
+        # Load the files
+        model = Model.from_pickles(movie_list_path, similarity_path)
+        model.validate()
+
+        # Save artifacts so the next start (and every other worker) can mmap them
+        try:
+            with host_lock():
+                if resolve_artifact_dir(ARTIFACTS_DIR)[1] is None:
+                    manifest = write_artifacts(ARTIFACTS_DIR, model.movies['title'].tolist(), model.movie_ids,
+                                               model.neighbor_ids, model.neighbor_scores, similarity=model.similarity)
+                    # Same data as the version just published, so the watcher has nothing to swap in
+                    model.version = manifest['version']
+                    print(f"Wrote model artifacts to {ARTIFACTS_DIR}/{model.version}")
+        except Exception as e:
+            print(f"Warning: could not write model artifacts: {e}")
+
+        active_model = model
+        print(f"Loaded {len(model.movies)} movies successfully!")
         return True
         
     except Exception as e:
         print(f"Error loading pickle files: {e}")
         return False
 
+def watch_model_versions():
+    """Poll CURRENT and hot-swap in any newly published version"""
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        current = active_model
+        try:
+            version, path = resolve_artifact_dir(ARTIFACTS_DIR)
+            if path is not None and (current is None or current.version != version):
+                reload_model()
+        except Exception as e:
+            metrics.inc('model_reload_failures_total')
+            print(f"Model reload failed, still serving {current.version if current else 'nothing'}: {e}")
+
+# Readiness of the background bootstrap: idle -> downloading -> loading -> ready | failed
+bootstrap_status = {'state': 'idle', 'files': {}, 'error': None}
+bootstrap_lock = threading.Lock()
+bootstrap_thread = None
+
+def set_bootstrap_state(state, error=None):
+    with bootstrap_lock:
+        bootstrap_status['state'] = state
+        bootstrap_status['error'] = error
+
+def record_download_progress(name, done, total):
+    with bootstrap_lock:
+        bootstrap_status['files'][name] = {'bytes': done, 'total': total}
+
+def ensure_artifacts():
+    """Make sure mmap-able artifacts exist on this host, downloading and converting at most once"""
+    if resolve_artifact_dir(ARTIFACTS_DIR)[1] is not None:
+        return True
+    # Other workers block here while the first one downloads, then find the artifacts ready
+    with host_lock():
+        if resolve_artifact_dir(ARTIFACTS_DIR)[1] is not None:
+            return True
+        if not download_missing_pickles(progress=record_download_progress):
+            return False
+        try:
+            print("Converting pickles to model artifacts...")
+            convert_pickles(out_dir=ARTIFACTS_DIR)
+        except Exception as e:
+            # load_data() can still fall back to the pickles themselves
+            print(f"Warning: could not convert pickles to artifacts: {e}")
+        return True
+
+def run_bootstrap():
+    """Fetch and load the model in the background, reporting progress through bootstrap_status"""
+    try:
+        set_bootstrap_state('downloading')
+        if not ensure_artifacts():
+            set_bootstrap_state('failed', "Could not download the model files")
+            return
+        set_bootstrap_state('loading')
+        if load_data():
+            set_bootstrap_state('ready')
+            print("Data loaded successfully! App is ready.")
+            if MODEL_WATCH_INTERVAL > 0:
+                threading.Thread(target=watch_model_versions, daemon=True, name='model-watcher').start()
+        else:
+            set_bootstrap_state('failed', "Could not load the model files")
+    except Exception as e:
+        set_bootstrap_state('failed', str(e))
+        print(f"Error during bootstrap: {e}")
+
+def start_bootstrap():
+    """Start loading the model in a background thread (once per process)"""
+    global bootstrap_thread
+    with bootstrap_lock:
+        if bootstrap_thread is not None:
+            return
+        bootstrap_thread = threading.Thread(target=run_bootstrap, daemon=True, name='bootstrap')
+    bootstrap_thread.start()
+
+def not_ready_response():
+    """503 telling clients (and load balancers) that the model is not loaded yet"""
+    with bootstrap_lock:
+        state = bootstrap_status['state']
+    if state == 'failed':
+        return jsonify({'error': 'Movie data not loaded', 'state': state}), 500
+    return jsonify({'error': 'Movie data is still loading, please retry shortly', 'state': state}), 503
+
 def fetch_poster_and_rating(movie_id):
-    """Fetch poster and rating from TMDB API"""
+    """Fetch poster and rating, serving repeat lookups from the metadata cache"""
+    if not os.getenv("TMDB_API_KEY"):
+        print("Warning: TMDB_API_KEY not set, using placeholder images")
+        return "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=No+API+Key", "N/A"
+
+    cached = metadata_cache.get(movie_id)
+    if cached is not None:
+        return cached
+    return tmdb_flight.do(movie_id, fetch_and_cache, movie_id)
+
+def fetch_and_cache(movie_id):
+    poster, rating, ok = fetch_from_tmdb(movie_id)
+    # Failures and 404s are cached too, so a bad id does not hammer the API;
+    # calls the breaker refused say nothing about the movie and are not cached
+    if ok is not None:
+        metadata_cache.set(movie_id, poster, rating, negative=not ok)
+    return poster, rating
+
+def fetch_from_tmdb(movie_id, use_breaker=True):
+    """Fetch poster and rating from TMDB API, returning (poster, rating, ok); ok is None if the breaker is open"""
+    if use_breaker and not tmdb_breaker.allow():
+        metrics.inc('tmdb_requests_total', status='short_circuited')
+        return "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Unavailable", "N/A", None
+
+    started = time.perf_counter()
+    healthy = False
     try:
         TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-        if not TMDB_API_KEY:
-            print("Warning: TMDB_API_KEY not set, using placeholder images")
-            return "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=No+API+Key", "N/A"
-
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
-        response = requests.get(url, timeout=10)
+        url = f"{TMDB_API_BASE}/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
+        try:
+            response = tmdb_session.get(url, timeout=TMDB_TIMEOUT)
+        except requests.Timeout:
+            metrics.inc('tmdb_requests_total', status='timeout')
+            raise
+        except requests.RequestException:
+            metrics.inc('tmdb_requests_total', status='error')
+            raise
+        metrics.inc('tmdb_requests_total', status=str(response.status_code))
+        # A 404 is a healthy answer about a bad id; only throttling and server errors count against TMDB
+        healthy = response.status_code < 500 and response.status_code != 429
         response.raise_for_status()
         data = response.json()
 
@@ -112,74 +1370,464 @@ def fetch_poster_and_rating(movie_id):
         if rating != 'N/A':
             rating = round(float(rating), 1)
         
-        return full_path, rating
+        return full_path, rating, True
 
     except Exception as e:
         print(f"Error fetching data for movie_id {movie_id}: {e}")
-        return "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Error+Loading", "N/A"
+        return "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Error+Loading", "N/A", False
+    finally:
+        if use_breaker:
+            tmdb_breaker.record(healthy, time.perf_counter() - started)
+
+def warm_metadata_cache(movie_ids):
+    """Prefetch poster/rating for every movie_id into the cache, skipping fresh entries"""
+    pending = [movie_id for movie_id in movie_ids if metadata_cache.get(movie_id) is None]
+    print(f"Warming metadata cache: {len(movie_ids) - len(pending)} cached, {len(pending)} to fetch")
+
+    # Offline and bounded by the pool, so the breaker stays out of it: short-circuiting would only
+    # turn a burst of throttling into hundreds of ids that were never asked for
+    failed = 0
+    batch_size = TMDB_MAX_WORKERS * 8
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        results = tmdb_executor.map(lambda movie_id: fetch_from_tmdb(movie_id, use_breaker=False), batch)
+        for movie_id, (poster, rating, ok) in zip(batch, results):
+            metadata_cache.set(movie_id, poster, rating, negative=not ok)
+            failed += not ok
+        print(f"  {min(start + batch_size, len(pending))}/{len(pending)} fetched")
 
-def recommend(movie):
+    return len(pending), failed
+
+@timed('enrichment')
+def enrich_movies(movie_ids, deadline=ENRICHMENT_DEADLINE):
+    """Fetch posters and ratings concurrently, giving up on stragglers after one overall deadline"""
+    futures = [tmdb_executor.submit(fetch_poster_and_rating, movie_id) for movie_id in movie_ids]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for movie_id, future in zip(movie_ids, futures):
+        if future.done():
+            results.append(future.result())
+        else:
+            future.cancel()
+            metrics.inc('enrichment_deadline_exceeded_total')
+            print(f"Timed out fetching data for movie_id {movie_id}")
+            results.append(("https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Timed+Out", "N/A"))
+    return results
+
+# Placeholders that stand in for a lookup that did not succeed, as opposed to a movie with no poster
+MISSING_POSTER_MARKERS = ('text=No+API+Key', 'text=Error+Loading', 'text=Timed+Out', 'text=Unavailable')
+
+def enrich_batch(movie_ids, deadline=BATCH_ENRICHMENT_DEADLINE, concurrency=BATCH_ENRICHMENT_CONCURRENCY):
+    """Map movie_id -> (poster, rating) with at most concurrency lookups in flight; missing ids are absent"""
+    remaining = iter(movie_ids)
+    in_flight = {}
+    stop_at = time.monotonic() + deadline if deadline > 0 else None
+
+    def submit_next():
+        for movie_id in remaining:
+            in_flight[tmdb_executor.submit(fetch_poster_and_rating, movie_id)] = movie_id
+            return
+
+    for _ in range(concurrency):
+        submit_next()
+
+    results = {}
+    with timed('enrichment'):
+        while in_flight:
+            timeout = None if stop_at is None else stop_at - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                break
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                movie_id = in_flight.pop(future)
+                poster, rating = future.result()
+                if not poster.endswith(MISSING_POSTER_MARKERS):
+                    results[movie_id] = (poster, rating)
+                submit_next()
+
+    for future in in_flight:
+        future.cancel()
+    missed = len(movie_ids) - len(results)
+    if missed:
+        metrics.inc('batch_enrichment_missing_total', missed)
+        print(f"Batch enrichment left {missed} of {len(movie_ids)} movies without metadata")
+    return results
+
+def stream_enrichment(movie_ids, deadline=ENRICHMENT_DEADLINE):
+    """Yield (position, poster, rating) for each movie_id as its lookup finishes, fastest first"""
+    futures = {tmdb_executor.submit(fetch_poster_and_rating, movie_id): position
+               for position, movie_id in enumerate(movie_ids)}
+    pending = dict(futures)
+    try:
+        with timed('enrichment'):
+            try:
+                for future in as_completed(futures, timeout=deadline):
+                    del pending[future]
+                    poster, rating = future.result()
+                    yield futures[future], poster, rating
+            except FutureTimeoutError:
+                for future, position in list(pending.items()):
+                    del pending[future]
+                    if future.done():
+                        poster, rating = future.result()
+                        yield position, poster, rating
+                        continue
+                    future.cancel()
+                    metrics.inc('enrichment_deadline_exceeded_total')
+                    print(f"Timed out fetching data for movie_id {movie_ids[position]}")
+                    yield position, "https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Timed+Out", "N/A"
+    finally:
+        # The client went away mid-stream: don't spend TMDB calls on posters nobody will see
+        for future in pending:
+            future.cancel()
+
+def rank_movie(model, movie, k=5, page=0):
+    """Row indices of one page of neighbors for a title (empty if it does not resolve)"""
+    try:
+        # Resolve the query to a single title, preferring an exact match
+        with timed('search'):
+            index = model.title_index.resolve(movie)
+        if index is None:
+            return np.empty(0, dtype=np.int64)
+
+        # Pages stop where the stored neighbor lists do, so the ANN query never grows into a full scan
+        start, stop = page * k, min(page * k + k, model.neighbor_ids.shape[1])
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+        with timed('ranking'):
+            if model.ann_index is not None:
+                neighbors, _ = model.ann_index.query(index, stop)
+                neighbors = neighbors[start:]
+            else:
+                # Neighbors are stored best first, so a page is a plain slice of the row
+                neighbors = model.neighbor_ids[index, start:stop]
+        return neighbors
+    except Exception as e:
+        print(f"Error in rank_movie function: {e}")
+        return np.empty(0, dtype=np.int64)
+
+def recommend(model, movie, k=5, page=0):
     """Generate movie recommendations"""
     try:
-        if movies is None or similarity is None:
-            return [], [], []
-            
-        # Find movies that match the search query
-        movie_matches = movies[movies['title'].str.contains(movie, case=False, na=False)]
-        if movie_matches.empty:
+        if model is None:
             return [], [], []
+        return describe_movies(model, rank_movie(model, movie, k=k, page=page))
+    except Exception as e:
+        print(f"Error in recommend function: {e}")
+        return [], [], []
+
+def describe_movies(model, indices, deadline=ENRICHMENT_DEADLINE):
+    """Return (names, posters, ratings) for the given row indices"""
+    recommended = model.movies.iloc[indices]
+    enriched = enrich_movies(recommended['movie_id'].tolist(), deadline=deadline)
+
+    recommended_movie_names = recommended['title'].tolist()
+    recommended_movie_posters = [poster for poster, _ in enriched]
+    recommended_movie_ratings = [rating for _, rating in enriched]
+
+    return recommended_movie_names, recommended_movie_posters, recommended_movie_ratings
+
+@timed('ranking')
+def rank_history(model, seed_indices, weights=None, exclude_indices=()):
+    """Rank candidates for several seed movies by their weighted summed neighbor scores"""
+    seed_indices = np.asarray(seed_indices, dtype=np.int64)
+    if weights is None:
+        weights = np.ones(len(seed_indices), dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
 
-        index = movie_matches.index[0]
-        distances = sorted(list(enumerate(similarity[index])), reverse=True, key=lambda x: x[1])
+    # Sum every seed's neighbor scores per candidate in one pass over the S x K neighbor lists
+    candidates = model.neighbor_ids[seed_indices].ravel()
+    contributions = (model.neighbor_scores[seed_indices].astype(np.float32) * weights[:, None]).ravel()
+    unique_ids, inverse = np.unique(candidates, return_inverse=True)
+    totals = np.bincount(inverse, weights=contributions, minlength=len(unique_ids))
 
-        recommended_movie_names = []
-        recommended_movie_posters = []
-        recommended_movie_ratings = []
+    seen = np.concatenate([seed_indices, np.asarray(exclude_indices, dtype=np.int64)])
+    keep = ~np.isin(unique_ids, seen)
+    unique_ids, totals = unique_ids[keep], totals[keep]
 
-        # Get top 5 similar movies (excluding the input movie itself)
-        for i in distances[1:6]:
-            movie_id = movies.iloc[i[0]].movie_id
-            poster, rating = fetch_poster_and_rating(movie_id)
-            recommended_movie_posters.append(poster)
-            recommended_movie_names.append(movies.iloc[i[0]].title)
-            recommended_movie_ratings.append(rating)
+    order = np.argsort(-totals, kind='stable')
+    return unique_ids[order], totals[order]
 
-        return recommended_movie_names, recommended_movie_posters, recommended_movie_ratings
+def rank_for_history(model, seeds, weights=None, exclude=(), k=5, page=0):
+    """Row indices of one page of recommendations for a watch history; returns (indices, has_more)"""
+    try:
+        seed_indices, seed_weights = [], []
+        with timed('search'):
+            for position, seed in enumerate(seeds):
+                index = model.title_index.resolve(seed)
+                if index is not None:
+                    seed_indices.append(index)
+                    seed_weights.append(1.0 if weights is None else weights[position])
+        if not seed_indices:
+            return np.empty(0, dtype=np.int64), False
+
+        # Excluded titles must match exactly; a fuzzy match could hide an unrelated movie
+        exclude_indices = [i for title in exclude for i in model.title_index.exact.get(normalize_title(title), [])]
+
+        ranked, _ = rank_history(model, seed_indices, seed_weights, exclude_indices)
+        start = page * k
+        return ranked[start:start + k], len(ranked) > start + k
     except Exception as e:
-        print(f"Error in recommend function: {e}")
-        return [], [], []
+        print(f"Error in rank_for_history function: {e}")
+        return np.empty(0, dtype=np.int64), False
+
+def recommend_for_history(model, seeds, weights=None, exclude=(), k=5, page=0):
+    """Recommend for a list of liked movies; returns (names, posters, ratings, has_more)"""
+    try:
+        if model is None:
+            return [], [], [], False
+        indices, has_more = rank_for_history(model, seeds, weights, exclude, k=k, page=page)
+        names, posters, ratings = describe_movies(model, indices)
+        return names, posters, ratings, has_more
+    except Exception as e:
+        print(f"Error in recommend_for_history function: {e}")
+        return [], [], [], False
+
+def max_batch_k(model):
+    """Largest k a batch can ask for: the stored neighbors, or more if the dense matrix is mapped"""
+    if model.similarity is not None:
+        return min(MAX_BATCH_K, len(model.movies) - 1)
+    return model.neighbor_ids.shape[1]
+
+def resolve_movie_ids(model, ids):
+    """Map TMDB movie_ids to row indices in one vectorized lookup (-1 when unknown)"""
+    ids = np.asarray(ids, dtype=np.int64)
+    sorted_ids = model.movie_ids[model.movie_id_order]
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    found = sorted_ids[pos] == ids
+    return np.where(found, model.movie_id_order[pos], -1)
+
+@timed('ranking')
+def batch_top_k(model, indices, k):
+    """Top-k neighbor (ids, scores) for many rows at once"""
+    indices = np.asarray(indices, dtype=np.int64)
+    if k <= model.neighbor_ids.shape[1]:
+        # The stored index already holds the answer; gathering it is cheaper than any rescoring
+        return model.neighbor_ids[indices, :k], model.neighbor_scores[indices, :k].astype(np.float32)
+
+    rows = np.array(model.similarity[indices], dtype=np.float32)
+    rows[np.arange(len(indices)), indices] = -np.inf
+    return top_k(rows, k, overwrite=True)
+
+def recommend_batch(model, titles=None, movie_ids=None, k=5, enrich=False):
+    """Yield one result dict per queried title or movie_id, computed in vectorized chunks"""
+    queries = list(titles) if titles is not None else list(movie_ids or [])
+    all_titles = model.titles
+    all_movie_ids = model.movie_ids
+
+    for start in range(0, len(queries), BATCH_CHUNK_SIZE):
+        chunk = queries[start:start + BATCH_CHUNK_SIZE]
+        if titles is not None:
+            indices = np.full(len(chunk), -1, dtype=np.int64)
+            for j, query in enumerate(chunk):
+                index = model.title_index.resolve(str(query))
+                if index is not None:
+                    indices[j] = index
+        else:
+            indices = resolve_movie_ids(model, chunk)
+
+        found = indices >= 0
+        ids, scores = batch_top_k(model, indices[found], k)
+
+        enriched = {}
+        if enrich and len(ids):
+            wanted = np.unique(all_movie_ids[ids]).tolist()
+            enriched = enrich_batch(wanted)
+
+        row = 0
+        for query, index in zip(chunk, indices):
+            if index < 0:
+                yield {'query': query, 'title': None, 'recommendations': []}
+                continue
+            recommendations = []
+            for neighbor, score in zip(ids[row].tolist(), scores[row].tolist()):
+                movie_id = int(all_movie_ids[neighbor])
+                item = {'title': all_titles[neighbor], 'movie_id': movie_id, 'score': round(score, 4)}
+                if enrich:
+                    # null rather than a placeholder URL, so batch consumers can tell what is missing
+                    item['poster'], item['rating'] = enriched.get(movie_id, (None, None))
+                recommendations.append(item)
+            row += 1
+            yield {'query': query, 'title': all_titles[index], 'recommendations': recommendations}
+
+# Strong validators must differ per content-coding, so each encoding gets its own ETag suffix
+ETAG_SUFFIXES = {None: '', 'gzip': '-gz', 'br': '-br'}
+
+def send_prepared(entry, cache_control, conditional=True):
+    """Send the smallest encoding the client accepts; with conditional, a 304 if it holds that ETag"""
+    body, encoding = entry['body'], None
+    for name in ('br', 'gzip'):
+        if name in entry['encodings'] and request.accept_encodings[name] > 0:
+            body, encoding = entry['encodings'][name], name
+            break
+    etag = entry['etag'] + ETAG_SUFFIXES[encoding]
+
+    # 304 is only defined for GET and HEAD, so POST callers pass conditional=False
+    if conditional and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, content_type=entry['content_type'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    if conditional:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.before_request
+def start_request_timer():
+    # Servers that skip gunicorn.conf.py still load the model on the first request
+    if active_model is None:
+        start_bootstrap()
+    g.model_version = None
+    g.request_started = time.perf_counter()
+    g.profiler = None
+    # Clients may only force a profile when the operator allowed it; otherwise they could fill the disk
+    g.profile_forced = request.headers.get('X-Profile') == '1' and os.environ.get('PROFILE_ENABLED') == '1'
+    if PROFILE_SLOW_REQUESTS_MS > 0 or g.profile_forced:
+        g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses are timed until their headers are sent, not until the body finishes
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe('request', elapsed)
+    metrics.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+    if g.get('model_version'):
+        response.headers['X-Model-Version'] = g.model_version
+
+    profiler = g.get('profiler')
+    if profiler is not None:
+        profiler.stop()
+        if elapsed * 1000 >= PROFILE_SLOW_REQUESTS_MS or g.get('profile_forced'):
+            path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{int(elapsed * 1000)}ms.folded")
+            profiler.dump(path)
+            print(f"Slow request to {request.path} took {elapsed * 1000:.0f}ms; profile written to {path}")
+    return response
 
 @app.route('/')
 def index():
-    if movies is None:
-        return render_template_string(ERROR_TEMPLATE, error="Movie data not loaded. Please check server logs for details.")
-    return render_template_string(INDEX_TEMPLATE)
+    if active_model is None:
+        if bootstrap_status['state'] == 'failed':
+            return render_template_string(ERROR_TEMPLATE, error="Movie data not loaded. Please check server logs for details.")
+        return render_template_string(ERROR_TEMPLATE, error="Movie data is still loading. Please refresh in a moment."), 503
+    return send_prepared(index_page, f'public, max-age={RESPONSE_MAX_AGE}')
 
 @app.route('/api/movies')
 def get_movies():
-    if movies is None:
-        return jsonify({'error': 'Movie data not loaded'}), 500
+    model = active_model
+    if model is None:
+        return not_ready_response()
+    g.model_version = model.version
 
-    query = request.args.get('q', '').lower()
-    if query:
-        filtered_movies = movies[movies['title'].str.contains(query, case=False, na=False)]['title'].tolist()
-        return jsonify(filtered_movies[:20])
-    else:
-        return jsonify(movies['title'].tolist()[:50])
+    # Queries that normalize the same return the same matches, so they share one entry
+    query = normalize_title(request.args.get('q', ''))
+    key = (model.version, 'movies', query)
+    entry = response_cache.get(key)
+    if entry is None:
+        if query:
+            with timed('search'):
+                matches = model.title_index.search(query, limit=20)
+            entry = prepare_json([model.title_index.titles[i] for i in matches])
+        else:
+            entry = prepare_json(model.titles[:50].tolist())
+        response_cache.set(key, entry)
+    return send_prepared(entry, f'public, max-age={RESPONSE_MAX_AGE}')
 
 @app.route('/api/recommend', methods=['POST'])
 def get_recommendations():
-    if movies is None or similarity is None:
-        return jsonify({'error': 'Movie data not loaded'}), 500
+    # Hold one snapshot for the whole request so a concurrent reload cannot mix two versions
+    model = active_model
+    if model is None:
+        return not_ready_response()
+    g.model_version = model.version
 
     data = request.get_json()
     movie_name = data.get('movie', '')
+    seeds = data.get('movies')
 
-    if not movie_name:
+    if seeds is not None:
+        # Watch-history mode: a list of liked movies with optional weights and exclusions
+        weights = data.get('weights')
+        exclude = data.get('exclude') or []
+        if not isinstance(seeds, list) or not seeds or not all(isinstance(seed, str) for seed in seeds):
+            return jsonify({'error': 'movies must be a non-empty list of titles'}), 400
+        if len(seeds) > MAX_HISTORY_SIZE:
+            return jsonify({'error': f'At most {MAX_HISTORY_SIZE} movies are allowed'}), 400
+        if not isinstance(exclude, list) or not all(isinstance(title, str) for title in exclude):
+            return jsonify({'error': 'exclude must be a list of titles'}), 400
+        if weights is not None:
+            try:
+                weights = [float(weight) for weight in weights]
+            except (TypeError, ValueError):
+                return jsonify({'error': 'weights must be a list of numbers'}), 400
+            if len(weights) != len(seeds):
+                return jsonify({'error': 'weights must have one entry per movie'}), 400
+    elif not movie_name:
         return jsonify({'error': 'Movie name is required'}), 400
 
-    names, posters, ratings = recommend(movie_name)
+    # k and page may come from the query string or the JSON body
+    try:
+        k = int(request.args.get('k', data.get('k', 5)))
+        page = int(request.args.get('page', data.get('page', 0)))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k and page must be integers'}), 400
+    stored_k = model.neighbor_ids.shape[1]
+    if not 1 <= k <= stored_k or page < 0:
+        return jsonify({'error': f'k must be between 1 and {stored_k} and page must be >= 0'}), 400
+    if seeds is None and page * k >= stored_k:
+        return jsonify({'error': f'page must be below {-(-stored_k // k)} for k={k}'}), 400
+
+    # ?stream=ndjson|sse (or an Accept header asking for either) sends titles before posters
+    stream_format = request.args.get('stream', data.get('stream'))
+    if stream_format in (True, '1', 'true'):
+        stream_format = 'ndjson'
+    elif not stream_format:
+        stream_format = {'application/x-ndjson': 'ndjson', 'text/event-stream': 'sse'}.get(
+            request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson', 'text/event-stream']))
+    if stream_format not in (None, 'ndjson', 'sse'):
+        return jsonify({'error': 'stream must be ndjson or sse'}), 400
+
+    def rank():
+        if seeds is not None:
+            return rank_for_history(model, seeds, weights, exclude, k=k, page=page)
+        return rank_movie(model, movie_name, k=k, page=page), (page + 1) * k < stored_k
+
+    def rank_and_describe():
+        indices, has_more = rank()
+        return describe_movies(model, indices, deadline=remaining_budget()), has_more
+
+    response = {
+        'k': k,
+        'page': page,
+        'model_version': model.version
+    }
+    if seeds is not None:
+        response['selected_movies'] = seeds
+    else:
+        response['selected_movie'] = movie_name
+
+    if stream_format is not None:
+        indices, response['has_more'] = rank()
+        return stream_recommendations(model, indices, response, stream_format)
 
+    # Concurrent identical queries (a trending title) share one ranking and one round of TMDB lookups
+    if seeds is not None:
+        key = (model.version, tuple(normalize_title(seed) for seed in seeds), tuple(weights or ()),
+               tuple(sorted(normalize_title(title) for title in exclude)), k, page)
+    else:
+        key = (model.version, normalize_title(movie_name), k, page)
+
+    # The body echoes the title as sent, so the serialized copy is keyed on that spelling too
+    cache_key = key + ('recommend', json.dumps(seeds if seeds is not None else movie_name))
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return send_prepared(entry, 'no-cache', conditional=False)
+
+    (names, posters, ratings), response['has_more'] = recommend_flight.do(key, rank_and_describe)
     recommendations = []
     for i in range(len(names)):
         recommendations.append({
@@ -187,24 +1835,143 @@ def get_recommendations():
             'poster': posters[i],
             'rating': ratings[i]
         })
+    response['recommendations'] = recommendations
+    entry = prepare_json(response)
+    # Placeholders from a slow or unavailable TMDB are not worth replaying to the next caller
+    if not any(poster.endswith(('text=Timed+Out', 'text=Unavailable')) for poster in posters):
+        response_cache.set(cache_key, entry)
+    return send_prepared(entry, 'no-cache', conditional=False)
+
+def stream_recommendations(model, indices, response, stream_format):
+    """Send the ranked titles at once, then one event per poster/rating as its lookup finishes"""
+    recommended = model.movies.iloc[indices]
+    movie_ids = [int(movie_id) for movie_id in recommended['movie_id']]
+    response = dict(response, recommendations=[
+        {'title': title, 'movie_id': movie_id, 'poster': None, 'rating': None}
+        for title, movie_id in zip(recommended['title'].tolist(), movie_ids)])
+    # Taken now, while ranking time still counts against this request's budget
+    deadline = remaining_budget()
+
+    def encode(event, payload):
+        if stream_format == 'sse':
+            return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps(dict(payload, event=event)) + '\n'
+
+    def generate():
+        yield encode('recommendations', response)
+        for position, poster, rating in stream_enrichment(movie_ids, deadline=deadline):
+            yield encode('enrichment', {'index': position, 'movie_id': movie_ids[position],
+                                        'poster': poster, 'rating': rating})
+        yield encode('done', {})
+
+    mimetype = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    # Tell nginx-style proxies not to buffer, or the first event waits for the last one
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/recommend/batch', methods=['POST'])
+def get_batch_recommendations():
+    """Stream recommendations for many titles or movie_ids as newline-delimited JSON"""
+    model = active_model
+    if model is None:
+        return not_ready_response()
+    g.model_version = model.version
+
+    data = request.get_json(silent=True) or {}
+    titles = data.get('movies') if isinstance(data, dict) else None
+    movie_ids = data.get('movie_ids') if isinstance(data, dict) else None
+    if (titles is None) == (movie_ids is None) or not isinstance(titles or movie_ids, list):
+        return jsonify({'error': 'Provide either a movies or a movie_ids list'}), 400
+    if len(titles or movie_ids) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} movies per batch'}), 400
+
+    limit = max_batch_k(model)
+    try:
+        k = int(data.get('k', 5))
+        if movie_ids is not None:
+            movie_ids = [int(movie_id) for movie_id in movie_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k and movie_ids must be integers'}), 400
+    if not 1 <= k <= limit:
+        return jsonify({'error': f'k must be between 1 and {limit}'}), 400
+
+    def generate():
+        for result in recommend_batch(model, titles, movie_ids, k=k, enrich=bool(data.get('enrich', False))):
+            yield json.dumps(result) + '\n'
 
-    return jsonify({
-        'selected_movie': movie_name,
-        'recommendations': recommendations
-    })
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/health')
 def health_check():
-    """Health check endpoint for Render"""
+    """Health check endpoint for Render; returns 503 until the model is loaded"""
+    with bootstrap_lock:
+        bootstrap = {'state': bootstrap_status['state'], 'error': bootstrap_status['error'],
+                     'files': dict(bootstrap_status['files'])}
+    model = active_model
     status = {
-        'status': 'healthy',
-        'movies_loaded': movies is not None,
-        'similarity_loaded': similarity is not None
+        'status': 'healthy' if model is not None else 'starting',
+        'bootstrap': bootstrap,
+        'movies_loaded': model is not None,
+        'similarity_loaded': model is not None and model.similarity is not None,
+        'neighbor_index_loaded': model is not None,
+        'engine': 'ann' if model is not None and model.ann_index is not None else 'exact'
     }
-    if movies is not None:
-        status['total_movies'] = len(movies)
+    if model is not None:
+        status['total_movies'] = len(model.movies)
+        status['model_version'] = model.version
+        status['model_loaded_at'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(model.loaded_at))
+    status['metadata_cache'] = metadata_cache.summary()
+    status['tmdb_circuit'] = tmdb_breaker.state
+    status['response_cache'] = response_cache.summary()
+    status['latency'] = metrics.summary()
+    status['rss_mb'] = round(process_rss_bytes() / 1024 / 1024, 1)
     
-    return jsonify(status)
+    return jsonify(status), 200 if model is not None else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (per process: each gunicorn worker reports its own numbers)"""
+    model = active_model
+    gauges = {
+        'process_resident_memory_bytes': process_rss_bytes(),
+        'artifact_bytes': 0 if model is None else model.artifact_bytes,
+        'movies_loaded': 0 if model is None else len(model.movies),
+        'model_loaded_timestamp_seconds': 0 if model is None else model.loaded_at,
+        # 0 closed, 1 half-open, 2 open
+        'tmdb_circuit_state': CircuitBreaker.STATES.index(tmdb_breaker.state),
+    }
+    # Hit/miss tallies only ever grow, so they are counters; only the current size is a gauge
+    counters = {}
+    for prefix, summary in (('metadata_cache', metadata_cache.summary()), ('response_cache', response_cache.summary())):
+        gauges[f'{prefix}_size'] = summary.pop('size')
+        for name, value in summary.items():
+            counters[f'{prefix}_{name}_total'] = value
+    return Response(metrics.render(gauges, counters), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load and swap in a model version (default: whatever CURRENT points at)"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    # Constant-time comparison so response timing does not leak how much of a guess matched
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not admin_token or not hmac.compare_digest(supplied.encode(), admin_token.encode()):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    previous = active_model
+    try:
+        model = reload_model(version=version, force=bool(data.get('force', False)))
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        metrics.inc('model_reload_failures_total')
+        print(f"Model reload failed: {e}")
+        return jsonify({'error': f'Reload failed: {e}',
+                        'model_version': previous.version if previous else None}), 500
+    return jsonify({'model_version': model.version,
+                    'previous_version': previous.version if previous else None,
+                    'total_movies': len(model.movies)})
 
 # Template strings
 INDEX_TEMPLATE = '''<!DOCTYPE html>
@@ -343,17 +2110,16 @@ INDEX_TEMPLATE = '''<!DOCTYPE html>
         <div id="recommendations" class="recommendations"></div>
     </div>
     <script>
-        let allMovies = []; let selectedMovie = '';
-        async function loadMovies() { try { const response = await fetch('/api/movies'); allMovies = await response.json(); console.log('Movies loaded successfully'); } catch (error) { showError('Failed to load movie database'); console.error('Error loading movies:', error); } }
+        let selectedMovie = '';
         const searchInput = document.getElementById('movieSearch'); const dropdown = document.getElementById('dropdown');
-        searchInput.addEventListener('input', function() { const query = this.value.toLowerCase().trim(); if (query.length === 0) { dropdown.style.display = 'none'; return; } const filtered = allMovies.filter(movie => movie.toLowerCase().includes(query)).slice(0, 12); if (filtered.length > 0) { dropdown.innerHTML = filtered.map(movie => `<div class="dropdown-item" onclick="selectMovie('${movie.replace(/'/g, "\\\'")}')"> ${movie} </div>`).join(''); dropdown.style.display = 'block'; } else { dropdown.innerHTML = '<div class="dropdown-item" style="color: #666; cursor: default;">No movies found</div>'; dropdown.style.display = 'block'; } });
+        searchInput.addEventListener('input', async function() { const query = this.value.trim(); if (query.length === 0) { dropdown.style.display = 'none'; return; } let filtered = []; try { const response = await fetch('/api/movies?q=' + encodeURIComponent(query)); filtered = (await response.json()).slice(0, 12); } catch (error) { console.error('Search error:', error); } if (this.value.trim() !== query) { return; } if (filtered.length > 0) { dropdown.innerHTML = filtered.map(movie => `<div class="dropdown-item" onclick="selectMovie('${movie.replace(/'/g, "\\\'")}')"> ${movie} </div>`).join(''); dropdown.style.display = 'block'; } else { dropdown.innerHTML = '<div class="dropdown-item" style="color: #666; cursor: default;">No movies found</div>'; dropdown.style.display = 'block'; } });
         document.addEventListener('click', function(event) { if (!searchInput.contains(event.target) && !dropdown.contains(event.target)) { dropdown.style.display = 'none'; } });
         function selectMovie(movie) { selectedMovie = movie; searchInput.value = movie; dropdown.style.display = 'none'; const selectedDiv = document.getElementById('selectedMovie'); document.getElementById('selectedMovieTitle').textContent = movie; selectedDiv.style.display = 'block'; }
         document.getElementById('recommendBtn').addEventListener('click', async function() { const movieToRecommend = selectedMovie || searchInput.value.trim(); if (!movieToRecommend) { showError('Please select a movie first to get personalized recommendations'); return; } await getRecommendations(movieToRecommend); });
-        async function getRecommendations(movie) { const loading = document.getElementById('loading'); const recommendations = document.getElementById('recommendations'); const recommendBtn = document.getElementById('recommendBtn'); loading.style.display = 'block'; recommendations.innerHTML = ''; recommendBtn.disabled = true; recommendBtn.textContent = 'Analyzing Your Taste...'; hideError(); try { const response = await fetch('/api/recommend', { method: 'POST', headers: { 'Content-Type': 'application/json', }, body: JSON.stringify({ movie: movie }) }); const data = await response.json(); if (data.error) { throw new Error(data.error); } loading.style.display = 'none'; if (data.recommendations && data.recommendations.length > 0) { recommendations.innerHTML = data.recommendations.map((movie) => `<div class="movie-card"> <img src="${movie.poster}" alt="${movie.title}" class="movie-poster" onerror="this.src='https://via.placeholder.com/500x750/1a1a1a/ffffff?text=${encodeURIComponent(movie.title)}'"> <div class="movie-title">${movie.title}</div> <div class="movie-rating"> <span class="rating-star">⭐</span> <span class="rating-value">${movie.rating}/10</span> </div> </div>`).join(''); } else { recommendations.innerHTML = `<div style="text-align: center; color: #666; grid-column: 1/-1; padding: 60px;"> <div style="font-size: 4rem; margin-bottom: 20px;">🤔</div> <h3 style="color: #fff; margin-bottom: 10px;">No recommendations found</h3> <p>Try searching for a different movie or check the spelling!</p> </div>`; } } catch (error) { loading.style.display = 'none'; showError('Failed to get recommendations: ' + error.message); console.error('Recommendation error:', error); } finally { recommendBtn.disabled = false; recommendBtn.innerHTML = 'Get Recommendations'; } }
+        async function getRecommendations(movie) { const loading = document.getElementById('loading'); const recommendations = document.getElementById('recommendations'); const recommendBtn = document.getElementById('recommendBtn'); loading.style.display = 'block'; recommendations.innerHTML = ''; recommendBtn.disabled = true; recommendBtn.textContent = 'Analyzing Your Taste...'; hideError(); try { const response = await fetch('/api/recommend?stream=ndjson', { method: 'POST', headers: { 'Content-Type': 'application/json', }, body: JSON.stringify({ movie: movie }) }); if (!response.ok || !response.body || !(response.headers.get('Content-Type') || '').includes('ndjson')) { const data = await response.json(); throw new Error(data.error || 'Unexpected response'); } const reader = response.body.getReader(); const decoder = new TextDecoder(); let buffered = ''; while (true) { const { done, value } = await reader.read(); if (done) { break; } buffered += decoder.decode(value, { stream: true }); const lines = buffered.split('\\n'); buffered = lines.pop(); lines.filter(line => line.trim()).forEach(line => handleRecommendationEvent(JSON.parse(line))); } } catch (error) { loading.style.display = 'none'; showError('Failed to get recommendations: ' + error.message); console.error('Recommendation error:', error); } finally { recommendBtn.disabled = false; recommendBtn.innerHTML = 'Get Recommendations'; } }
+        function handleRecommendationEvent(event) { const recommendations = document.getElementById('recommendations'); if (event.event === 'recommendations') { document.getElementById('loading').style.display = 'none'; if (event.recommendations.length > 0) { recommendations.innerHTML = event.recommendations.map((movie, index) => `<div class="movie-card" id="card-${index}"> <img src="https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Loading" alt="${movie.title}" class="movie-poster" onerror="this.src='https://via.placeholder.com/500x750/1a1a1a/ffffff?text=${encodeURIComponent(movie.title)}'"> <div class="movie-title">${movie.title}</div> <div class="movie-rating"> <span class="rating-star">⭐</span> <span class="rating-value">…/10</span> </div> </div>`).join(''); } else { recommendations.innerHTML = `<div style="text-align: center; color: #666; grid-column: 1/-1; padding: 60px;"> <div style="font-size: 4rem; margin-bottom: 20px;">🤔</div> <h3 style="color: #fff; margin-bottom: 10px;">No recommendations found</h3> <p>Try searching for a different movie or check the spelling!</p> </div>`; } } else if (event.event === 'enrichment') { const card = document.getElementById('card-' + event.index); if (card) { card.querySelector('.movie-poster').src = event.poster; card.querySelector('.rating-value').textContent = event.rating + '/10'; } } }
         function showError(message) { const errorDiv = document.getElementById('errorMessage'); errorDiv.innerHTML = message; errorDiv.style.display = 'block'; }
         function hideError() { document.getElementById('errorMessage').style.display = 'none'; }
-        loadMovies();
     </script>
 </body>
 </html>'''
@@ -393,17 +2159,129 @@ def render_template_string(template, **context):
         template = template.replace('{{ ' + key + ' }}', str(value))
     return template
 
-if __name__ == '__main__':
+# The page has no per-request content: render and compress it once
+index_page = prepare_response(render_template_string(INDEX_TEMPLATE), 'text/html; charset=utf-8')
+
+def serve():
+    """Run the development server, loading data in the background"""
     print("Starting CineAI Movie Recommendation System...")
     
-    # Load data on startup
-    if not load_data():
-        print("Warning: Failed to load data. App will start but functionality will be limited.")
-    else:
-        print("Data loaded successfully! App is ready.")
+    # Load data in the background so the port is bound immediately; /health reports progress
+    start_bootstrap()
     
     # Get port from environment or default to 5000
     port = int(os.environ.get('PORT', 5000))
     
     # Run the app
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CineAI Movie Recommendation System")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('serve', help="run the web server (default)")
+
+    convert = subparsers.add_parser('convert', help="convert the pickle files into mmap-able artifacts")
+    convert.add_argument('--movie-list', default="movie_list.pkl")
+    convert.add_argument('--similarity', default="similarity.pkl")
+    convert.add_argument('--out', default=ARTIFACTS_DIR)
+    convert.add_argument('-k', type=int, default=NEIGHBOR_K, help="neighbors stored per movie")
+    convert.add_argument('--no-similarity', action='store_true',
+                         help="store only the top-K neighbor index, not the dense matrix")
+
+    build = subparsers.add_parser('build', help="build artifacts from raw movie metadata in streaming chunks")
+    build.add_argument('source', help="movie metadata (.csv or .pkl) with tags, or raw TMDB columns")
+    build.add_argument('--credits', help="TMDB credits CSV to merge for cast and director")
+    build.add_argument('--out', default=ARTIFACTS_DIR)
+    build.add_argument('-k', type=int, default=NEIGHBOR_K, help="neighbors stored per movie")
+    build.add_argument('--chunk-size', type=int, help="rows scored per task (default: sized from --memory-mb)")
+    build.add_argument('--workers', type=int, help="worker processes (default: CPU count; lowered, with a notice, to fit --memory-mb)")
+    build.add_argument('--memory-mb', type=float, default=BUILD_MEMORY_MB,
+                       help="memory budget for similarity blocks across all workers")
+    build.add_argument('--max-features', type=int, default=5000)
+    build.add_argument('--engine', choices=['exact', 'ann'], default='exact',
+                       help="exact scores every pair; ann only rescans LSH candidates")
+
+    versions = subparsers.add_parser('versions', help="list published artifact versions (* marks CURRENT)")
+    versions.add_argument('--artifacts', default=ARTIFACTS_DIR)
+
+    activate = subparsers.add_parser('activate', help="point CURRENT at a published version (deploy or roll back)")
+    activate.add_argument('version')
+    activate.add_argument('--artifacts', default=ARTIFACTS_DIR)
+
+    ann_eval = subparsers.add_parser('ann-eval', help="measure ANN recall@K and latency against exact search")
+    ann_eval.add_argument('--artifacts', default=ARTIFACTS_DIR)
+    ann_eval.add_argument('-k', type=int, default=10)
+    ann_eval.add_argument('--sample', type=int, default=200)
+    ann_eval.add_argument('--tables', type=int, default=ANN_TABLES)
+    ann_eval.add_argument('--bits', type=int, default=ANN_BITS)
+    ann_eval.add_argument('--probe-radius', type=int, default=ANN_PROBE_RADIUS)
+
+    checksum = subparsers.add_parser('checksum', help="print the SHA-256 of files, e.g. to pin ARTIFACT_SOURCES")
+    checksum.add_argument('paths', nargs='+')
+
+    warm = subparsers.add_parser('warm', help="prefetch TMDB metadata for every movie into the cache")
+    warm.add_argument('--movie-list', default="movie_list.pkl")
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        manifest = convert_pickles(args.movie_list, args.similarity, args.out,
+                                   include_similarity=not args.no_similarity, k=args.k)
+        print(f"Wrote {manifest['num_movies']} movies (k={manifest['neighbor_k']}) to {args.out}/{manifest['version']}")
+        return 0
+
+    if args.command == 'build':
+        manifest = build_artifacts(args.source, args.out, credits=args.credits, k=args.k,
+                                   chunk_size=args.chunk_size, workers=args.workers,
+                                   max_features=args.max_features, engine=args.engine,
+                                   memory_mb=args.memory_mb)
+        print(f"Wrote {manifest['num_movies']} movies (k={manifest['neighbor_k']}) to {args.out}/{manifest['version']}")
+        return 0
+
+    if args.command == 'versions':
+        current, _ = resolve_artifact_dir(args.artifacts)
+        for version in list_versions(args.artifacts):
+            print(f"{'*' if version == current else ' '} {version}")
+        return 0
+
+    if args.command == 'activate':
+        if args.version not in list_versions(args.artifacts):
+            print(f"Unknown version {args.version}; see 'app.py versions'")
+            return 1
+        set_current_version(args.artifacts, args.version)
+        print(f"CURRENT now points at {args.version}; servers pick it up within {MODEL_WATCH_INTERVAL:g}s")
+        return 0
+
+    if args.command == 'ann-eval':
+        _, path = resolve_artifact_dir(args.artifacts)
+        if path is None:
+            print(f"No artifacts found in {args.artifacts}")
+            return 1
+        manifest, arrays = load_artifacts(path)
+        vectors = load_vectors(arrays, manifest)
+        if vectors is None:
+            print("These artifacts have no movie vectors; rebuild them with 'app.py build'")
+            return 1
+        ann = LSHIndex(vectors, num_tables=args.tables, num_bits=args.bits, probe_radius=args.probe_radius)
+        print(json.dumps(evaluate_ann(ann, k=args.k, sample=args.sample), indent=2))
+        return 0
+
+    if args.command == 'checksum':
+        for path in args.paths:
+            print(f"{file_sha256(path)}  {path}")
+        return 0
+
+    if args.command == 'warm':
+        if not os.getenv("TMDB_API_KEY"):
+            print("TMDB_API_KEY must be set to warm the metadata cache")
+            return 1
+        with open(args.movie_list, 'rb') as f:
+            movie_list = pickle.load(f)
+        fetched, failed = warm_metadata_cache([int(movie_id) for movie_id in movie_list['movie_id']])
+        print(f"Fetched {fetched} movies ({failed} failed); cache stats: {metadata_cache.summary()}")
+        return 0
+
+    serve()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
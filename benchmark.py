@@ -0,0 +1,391 @@
+"""Benchmark harness for the CineAI recommendation service.
+
+Generates synthetic catalogs, runs a stub TMDB server, and measures startup,
+per-worker memory, search and recommendation latency through the real app
+served by gunicorn with the same worker layout as render.yaml.
+
+    python benchmark.py run --sizes 5000,50000,200000 --output bench.json
+    python benchmark.py compare old.json new.json
+    python benchmark.py stub-tmdb --port 8765 --latency 0.05
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import requests
+
+import app
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+TITLE_WORDS = [
+    'the', 'dark', 'night', 'love', 'war', 'star', 'city', 'last', 'return', 'ghost', 'house', 'blue',
+    'king', 'queen', 'lost', 'secret', 'island', 'fire', 'ice', 'man', 'woman', 'story', 'legend',
+    'shadow', 'river', 'empire', 'dream', 'storm', 'code', 'heart', 'iron', 'silent', 'golden', 'wild',
+]
+TAG_WORDS = [f'tag{i}' for i in range(2000)]
+
+class StubTMDBHandler(BaseHTTPRequestHandler):
+    """Answers /movie/<id> like api.themoviedb.org, with injected latency and errors"""
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            fail = server.rng.random() < server.error_rate
+
+        if '/movie/' not in self.path or fail:
+            self.send_response(404 if not fail else 500)
+            self.end_headers()
+            return
+
+        movie_id = self.path.split('/movie/')[1].split('?')[0]
+        body = json.dumps({'id': movie_id, 'poster_path': f'/poster-{movie_id}.jpg',
+                           'vote_average': 5 + (hash(movie_id) % 50) / 10}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_tmdb(port=0, latency=0.0, error_rate=0.0, seed=0):
+    """Start a threaded stub TMDB server in the background and return it"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubTMDBHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def generate_catalog(n, out_dir, dense_max=10000, k=app.NEIGHBOR_K, seed=0):
+    """Write a synthetic movie_list.pkl plus similarity.pkl (small catalogs) or artifacts (large ones)"""
+    rng = np.random.default_rng(seed)
+    words = np.array(TITLE_WORDS)
+    titles = [' '.join(words[rng.integers(len(words), size=rng.integers(1, 5))]).title() + f' {i}'
+              for i in range(n)]
+    movie_ids = rng.permutation(np.arange(1, n * 3))[:n]
+    tags = [' '.join(rng.choice(TAG_WORDS, size=12)) for _ in range(n)]
+    movie_list = pd.DataFrame({'movie_id': movie_ids, 'title': titles, 'tags': tags})
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'movie_list.pkl'), 'wb') as f:
+        pickle.dump(movie_list, f)
+
+    if n <= dense_max:
+        embeddings = rng.standard_normal((n, 32)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        with open(os.path.join(out_dir, 'similarity.pkl'), 'wb') as f:
+            pickle.dump(embeddings @ embeddings.T, f)
+        return 'pickle'
+
+    # A dense N x N matrix does not fit at this size; write random neighbor lists straight to artifacts
+    k = min(k, n - 1)
+    ids = rng.integers(0, n, size=(n, k), dtype=np.int32)
+    scores = -np.sort(-rng.random((n, k), dtype=np.float32), axis=1)
+    app.write_artifacts(os.path.join(out_dir, 'artifacts'), titles, movie_ids, ids, scores)
+    return 'artifacts'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def process_memory_mb(pid):
+    """RSS and PSS (shared pages split between processes) of a process, from /proc, in MB"""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss_mb'] = round(int(line.split()[1]) / 1024, 1)
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    memory['pss_mb'] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+def child_pids(pid):
+    """PIDs whose parent is pid (gunicorn workers of a master), from /proc"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+def server_memory_mb(master_pid):
+    """Per-worker RSS/PSS of a gunicorn server; summed PSS counts shared mmap pages only once"""
+    workers = [dict(pid=pid, **process_memory_mb(pid)) for pid in child_pids(master_pid)]
+    return {'master': process_memory_mb(master_pid),
+            'workers': workers,
+            'worker_rss_total_mb': round(sum(w.get('rss_mb', 0) for w in workers), 1),
+            'worker_pss_total_mb': round(sum(w.get('pss_mb', 0) for w in workers), 1)}
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {}
+    values = np.array(samples_ms)
+    return {'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'mean_ms': round(float(values.mean()), 3)}
+
+def measure_startup(workdir, env):
+    """Time load_data() in a fresh interpreter and report its memory afterwards"""
+    script = (
+        "import json, os, time, app\n"
+        "started = time.time()\n"
+        "ok = app.load_data()\n"
+        "elapsed = time.time() - started\n"
+        "import benchmark\n"
+        "print('RESULT ' + json.dumps(dict(ok=ok, seconds=round(elapsed, 3), **benchmark.process_memory_mb(os.getpid()))))\n"
+    )
+    env = dict(env, PYTHONPATH=os.pathsep.join([os.path.dirname(APP_PATH), env.get('PYTHONPATH', '')]))
+    output = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.split('RESULT ', 1)[1])
+
+def start_server(workdir, env, port, workers=2, threads=4, timeout=600):
+    """Run the app under gunicorn like render.yaml does and wait until every worker has the data loaded"""
+    repo = os.path.dirname(APP_PATH)
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--threads', str(threads), '--timeout', '120',
+               '--config', os.path.join(repo, 'gunicorn.conf.py'), '--pythonpath', repo]
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Each worker loads on its own and answers 503 until then; fresh connections land on random
+    # workers, so a long run of healthy answers means all of them are ready
+    needed = workers * 10
+    healthy = 0
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            loaded = requests.get(f'http://127.0.0.1:{port}/health', timeout=1).json().get('movies_loaded')
+        except requests.RequestException:
+            loaded = False
+        healthy = healthy + 1 if loaded else 0
+        if healthy >= needed and len(child_pids(process.pid)) >= workers:
+            return process
+        time.sleep(0.02 if loaded else 0.2)
+    process.kill()
+    raise RuntimeError("Server did not become ready in time")
+
+def load_test(url, payloads, concurrency, requests_per_worker):
+    """Fire POSTs from concurrent clients; return latency percentiles, throughput and errors"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(worker):
+        nonlocal errors
+        session = requests.Session()
+        local = []
+        local_errors = 0
+        for i in range(requests_per_worker):
+            payload = payloads[(worker * requests_per_worker + i) % len(payloads)]
+            started = time.perf_counter()
+            try:
+                response = session.post(url, json=payload, timeout=60)
+                if response.status_code != 200:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return dict(percentiles(latencies), requests=len(latencies), errors=errors,
+                concurrency=concurrency, throughput_rps=round(len(latencies) / elapsed, 1))
+
+def benchmark_size(n, args, stub):
+    """Run every measurement against one synthetic catalog size"""
+    result = {'movies': n}
+    with tempfile.TemporaryDirectory(prefix=f'cineai-bench-{n}-') as workdir:
+        started = time.time()
+        result['format'] = generate_catalog(n, workdir, dense_max=args.dense_max, seed=args.seed)
+        result['generate_seconds'] = round(time.time() - started, 1)
+
+        env = dict(os.environ,
+                   ARTIFACTS_DIR=os.path.join(workdir, 'artifacts'),
+                   TMDB_API_KEY='benchmark',
+                   TMDB_API_BASE=f'http://127.0.0.1:{stub.server_port}/3',
+                   METADATA_CACHE_DB='' if args.no_metadata_cache else os.path.join(workdir, 'tmdb.sqlite3'))
+        if args.no_metadata_cache:
+            env['METADATA_CACHE_SIZE'] = '0'
+
+        # The first start converts the pickles; the second measures the mmap path every worker takes
+        if result['format'] == 'pickle':
+            result['startup_pickle'] = measure_startup(workdir, env)
+        result['startup_artifacts'] = measure_startup(workdir, env)
+        print(f"[{n}] startup: {result}")
+
+        # In-process search latency over the loaded title index
+        app.ARTIFACTS_DIR = env['ARTIFACTS_DIR']
+        app.load_data()
+        rng = random.Random(args.seed)
+        titles = app.active_model.movies['title'].tolist()
+        queries = [rng.choice(titles)[:rng.randint(1, 12)] for _ in range(args.search_queries)]
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            app.active_model.title_index.search(query, limit=20)
+            timings.append((time.perf_counter() - started) * 1000)
+        result['search'] = percentiles(timings)
+        print(f"[{n}] search: {result['search']}")
+
+        port = free_port()
+        server = start_server(workdir, env, port, workers=args.workers, threads=args.threads)
+        try:
+            result['server_memory'] = server_memory_mb(server.pid)
+            print(f"[{n}] server memory: {result['server_memory']}")
+            base = f'http://127.0.0.1:{port}'
+
+            started = time.perf_counter()
+            for query in queries[:200]:
+                requests.get(f'{base}/api/movies', params={'q': query}, timeout=30)
+            result['http_search_mean_ms'] = round((time.perf_counter() - started) * 1000 / min(200, len(queries)), 3)
+
+            payloads = [{'movie': rng.choice(titles)} for _ in range(1000)]
+            result['recommend'] = load_test(f'{base}/api/recommend', payloads,
+                                            args.concurrency, args.requests)
+            result['server_memory_after_load'] = server_memory_mb(server.pid)
+            print(f"[{n}] recommend: {result['recommend']}")
+        finally:
+            server.terminate()
+            server.wait()
+    return result
+
+def run(args):
+    stub = start_stub_tmdb(latency=args.tmdb_latency, error_rate=args.tmdb_error_rate, seed=args.seed)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(APP_PATH)).stdout.strip()
+    except OSError:
+        commit = None
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key != 'func'},
+        'results': [],
+    }
+    for n in [int(size) for size in args.sizes.split(',')]:
+        report['results'].append(benchmark_size(n, args, stub))
+    report['tmdb_stub_requests'] = stub.requests
+    stub.shutdown()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+def flatten(value, prefix=''):
+    """Flatten nested dicts into dotted keys holding numbers"""
+    items = {}
+    for key, item in value.items():
+        if isinstance(item, dict):
+            items.update(flatten(item, f'{prefix}{key}.'))
+        elif isinstance(item, (int, float)) and not isinstance(item, bool):
+            items[f'{prefix}{key}'] = item
+    return items
+
+def compare(args):
+    """Print per-metric ratios between two benchmark reports"""
+    with open(args.baseline) as f:
+        baseline = {result['movies']: flatten(result) for result in json.load(f)['results']}
+    with open(args.candidate) as f:
+        candidate = {result['movies']: flatten(result) for result in json.load(f)['results']}
+
+    for n in sorted(set(baseline) & set(candidate)):
+        print(f"== {n} movies ==")
+        for key in sorted(set(baseline[n]) & set(candidate[n])):
+            old, new = baseline[n][key], candidate[n][key]
+            ratio = f"{new / old:.2f}x" if old else "n/a"
+            print(f"  {key:40s} {old:>12} -> {new:>12}  ({ratio})")
+    return 0
+
+def stub_tmdb(args):
+    server = start_stub_tmdb(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"Stub TMDB listening on http://127.0.0.1:{server.server_port}/3 (set TMDB_API_BASE to this)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CineAI benchmark harness")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="benchmark synthetic catalogs")
+    run_parser.add_argument('--sizes', default='5000,50000,200000')
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--dense-max', type=int, default=10000,
+                            help="largest catalog written as a dense similarity.pkl")
+    run_parser.add_argument('--workers', type=int, default=2, help="gunicorn workers (render.yaml uses 2)")
+    run_parser.add_argument('--threads', type=int, default=4, help="threads per gunicorn worker")
+    run_parser.add_argument('--concurrency', type=int, default=16)
+    run_parser.add_argument('--requests', type=int, default=50, help="requests per concurrent client")
+    run_parser.add_argument('--search-queries', type=int, default=2000)
+    run_parser.add_argument('--tmdb-latency', type=float, default=0.05, help="seconds per stub TMDB call")
+    run_parser.add_argument('--tmdb-error-rate', type=float, default=0.0)
+    run_parser.add_argument('--no-metadata-cache', action='store_true',
+                            help="send every enrichment to the stub TMDB server")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help="compare two benchmark reports")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.set_defaults(func=compare)
+
+    stub_parser = subparsers.add_parser('stub-tmdb', help="run only the stub TMDB server")
+    stub_parser.add_argument('--port', type=int, default=8765)
+    stub_parser.add_argument('--latency', type=float, default=0.05)
+    stub_parser.add_argument('--error-rate', type=float, default=0.0)
+    stub_parser.set_defaults(func=stub_tmdb)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Gunicorn settings, loaded automatically from the working directory by the Procfile command"""
+
+def post_worker_init(worker):
+    # Load the model in the background so the worker binds and answers /health immediately
+    from app import start_bootstrap
+    start_bootstrap()
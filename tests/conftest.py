@@ -0,0 +1,97 @@
+"""Shared fixtures: local HTTP servers standing in for TMDB and Google Drive"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+@pytest.fixture(autouse=True, scope='session')
+def memory_only_metadata_cache():
+    # Lookups that outlive a test must not write tmdb_cache.sqlite3 into the working directory
+    app.metadata_cache = app.MetadataCache(db_path=None)
+
+
+# Six movies with distinct pairwise similarities, so every ranking below has exactly one right answer
+SIMILARITY = np.array([
+    [1.00, 0.90, 0.10, 0.40, 0.20, 0.30],
+    [0.90, 1.00, 0.80, 0.15, 0.25, 0.35],
+    [0.10, 0.80, 1.00, 0.70, 0.05, 0.45],
+    [0.40, 0.15, 0.70, 1.00, 0.60, 0.12],
+    [0.20, 0.25, 0.05, 0.60, 1.00, 0.50],
+    [0.30, 0.35, 0.45, 0.12, 0.50, 1.00],
+], dtype=np.float32)
+MOVIE_IDS = [105, 101, 103, 100, 104, 102]
+
+
+@pytest.fixture
+def model(request, monkeypatch):
+    """Serve a six-movie model that keeps 3 neighbors per movie and maps the dense matrix"""
+    movies = pd.DataFrame({'movie_id': MOVIE_IDS, 'title': [f'Movie {i}' for i in range(len(MOVIE_IDS))]})
+    neighbor_ids, neighbor_scores = app.build_neighbor_index(SIMILARITY, k=3)
+    # A version per test keeps response cache entries from leaking between tests
+    model = app.Model(request.node.name, movies, neighbor_ids, neighbor_scores, similarity=SIMILARITY)
+    monkeypatch.setattr(app, 'active_model', model)
+    return model
+
+
+@pytest.fixture
+def serve():
+    """Start a threaded HTTP server for a handler class and return its base URL"""
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def tmdb_handler(latency=0.0, slow_ids=(), status=200, calls=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            movie_id = self.path.split('/movie/')[1].split('?')[0]
+            if calls is not None:
+                calls.append(movie_id)
+            time.sleep(latency if not slow_ids or movie_id in slow_ids else 0)
+            body = json.dumps({'poster_path': f'/{movie_id}.jpg', 'vote_average': 7.25}).encode()
+            if status != 200:
+                body = b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def tmdb(serve, monkeypatch):
+    """Point the app at a stub TMDB, with an empty cache and a fresh breaker (trips after 3 failures)"""
+    monkeypatch.setenv('TMDB_API_KEY', 'test')
+    monkeypatch.setattr(app, 'metadata_cache', app.MetadataCache(db_path=None))
+    monkeypatch.setattr(app, 'tmdb_breaker', app.CircuitBreaker('test', 3, 5, 60))
+
+    def start(**kwargs):
+        monkeypatch.setattr(app, 'TMDB_API_BASE', serve(tmdb_handler(**kwargs)))
+
+    return start
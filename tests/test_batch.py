@@ -0,0 +1,37 @@
+"""Batch recommendations for many titles or movie_ids"""
+import json
+
+import numpy as np
+
+import app
+
+
+def test_unknown_movie_ids_get_an_empty_result_in_place(model):
+    results = list(app.recommend_batch(model, movie_ids=[105, 999, 100], k=2))
+    assert [result['query'] for result in results] == [105, 999, 100]
+    assert results[1] == {'query': 999, 'title': None, 'recommendations': []}
+    assert [item['movie_id'] for item in results[0]['recommendations']] == [101, 100]
+    assert [item['title'] for item in results[2]['recommendations']] == ['Movie 2', 'Movie 4']
+
+
+def test_k_above_the_stored_neighbors_reads_the_dense_matrix(model):
+    assert app.max_batch_k(model) == 5
+    (result,) = app.recommend_batch(model, titles=['Movie 0'], k=5)
+    assert [item['title'] for item in result['recommendations']] == ['Movie 1', 'Movie 3', 'Movie 5',
+                                                                      'Movie 4', 'Movie 2']
+    assert np.allclose([item['score'] for item in result['recommendations']], [0.9, 0.4, 0.3, 0.2, 0.1])
+
+
+def test_batch_endpoint_streams_one_line_per_query(model):
+    response = app.app.test_client().post('/api/recommend/batch', json={'movies': ['Movie 3', 'Nope'], 'k': 4})
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line['title'] for line in lines] == ['Movie 3', None]
+    assert len(lines[0]['recommendations']) == 4
+
+
+def test_batch_endpoint_rejects_a_body_that_is_not_an_object(model):
+    client = app.app.test_client()
+    for body in ([{'movies': ['Movie 0']}], 'Movie 0', 7):
+        response = client.post('/api/recommend/batch', json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Provide either a movies or a movie_ids list'}
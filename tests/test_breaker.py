@@ -0,0 +1,71 @@
+"""The TMDB circuit breaker, on its own and in front of a stub TMDB"""
+import time
+
+import app
+
+
+def test_circuit_breaker_opens_half_opens_and_closes():
+    breaker = app.CircuitBreaker('test', failure_threshold=2, slow_call_seconds=1, cooldown=0.05)
+    breaker.record(False, 0.01)
+    breaker.record(True, 0.01)
+    breaker.record(False, 0.01)
+    # Only consecutive failures count
+    assert breaker.state == 'closed'
+
+    breaker.record(False, 0.01)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # One probe at a time
+    assert not breaker.allow()
+
+    breaker.record(True, 0.01)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_circuit_breaker_counts_slow_calls_and_reopens_on_a_failed_probe():
+    breaker = app.CircuitBreaker('test', failure_threshold=1, slow_call_seconds=0.5, cooldown=0.05)
+    breaker.record(True, 0.6)
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_open_breaker_short_circuits_tmdb_without_caching(tmdb):
+    calls = []
+    tmdb(status=503, calls=calls)
+    for movie_id in (1, 2, 3):
+        assert app.fetch_from_tmdb(movie_id)[2] is False
+    assert app.tmdb_breaker.state == 'open'
+
+    poster, rating, ok = app.fetch_from_tmdb(4)
+    assert ok is None
+    assert poster.endswith('text=Unavailable')
+    assert len(calls) == 3
+
+    app.fetch_poster_and_rating(5)
+    assert app.metadata_cache.get(5) is None
+
+
+def test_not_found_does_not_trip_the_breaker(tmdb):
+    tmdb(status=404)
+    for movie_id in range(5):
+        app.fetch_from_tmdb(movie_id)
+    assert app.tmdb_breaker.state == 'closed'
+
+
+def test_warm_bypasses_the_breaker(tmdb):
+    calls = []
+    tmdb(status=429, calls=calls)
+    assert app.warm_metadata_cache(list(range(20))) == (20, 20)
+    assert len(calls) == 20
+    assert app.tmdb_breaker.state == 'closed'
+    assert app.metadata_cache.get(0)[0].endswith('text=Error+Loading')
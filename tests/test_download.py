@@ -0,0 +1,90 @@
+"""Source pickle downloads against a local stand-in for Google Drive"""
+import hashlib
+import os
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import app
+
+CONTENT = bytes(range(256)) * 1000
+
+
+def drive_handler(requests_seen, confirm_page=False):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get('Range')))
+            if confirm_page and 'confirm=' not in self.path:
+                body = b'<html><a href="/uc?id=x&confirm=t0ken&export=download">Download anyway</a></html>'
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+            else:
+                byte_range = self.headers.get('Range')
+                start = int(byte_range.split('=')[1].split('-')[0]) if byte_range else 0
+                body = CONTENT[start:]
+                self.send_response(206 if byte_range else 200)
+                self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def drive(serve, monkeypatch):
+    """Point the app at a stub Drive and return the (path, Range) of every request it gets"""
+    requests_seen = []
+
+    def start(**kwargs):
+        monkeypatch.setattr(app, 'GDRIVE_BASE_URL', serve(drive_handler(requests_seen, **kwargs)) + '/uc')
+        return requests_seen
+
+    return start
+
+
+def test_download_resumes_from_a_partial_file(drive, tmp_path):
+    requests_seen = drive()
+    destination = str(tmp_path / 'movie_list.pkl')
+    with open(destination + '.part', 'wb') as f:
+        f.write(CONTENT[:100000])
+
+    assert app.download_from_gdrive('file-id', destination, sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert [byte_range for _, byte_range in requests_seen] == ['bytes=100000-']
+    with open(destination, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(destination + '.part')
+
+
+def test_download_rejects_a_checksum_mismatch(drive, tmp_path):
+    drive()
+    destination = str(tmp_path / 'similarity.pkl')
+
+    assert not app.download_from_gdrive('file-id', destination, sha256='0' * 64)
+    assert not os.path.exists(destination)
+    assert not os.path.exists(destination + '.part')
+
+
+def test_download_follows_the_confirmation_page(drive, tmp_path):
+    requests_seen = drive(confirm_page=True)
+    destination = str(tmp_path / 'similarity.pkl')
+
+    assert app.download_from_gdrive('file-id', destination, sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert 'confirm=t0ken' in requests_seen[-1][0]
+    with open(destination, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+def test_missing_pickles_are_not_downloaded_without_a_digest(drive, tmp_path, monkeypatch):
+    requests_seen = drive()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, 'ALLOW_UNVERIFIED_DOWNLOADS', False)
+    monkeypatch.setattr(app, 'ARTIFACT_SOURCES', {
+        'movie_list.pkl': {'gdrive_id': 'file-id', 'sha256': None, 'sha256_env': 'MOVIE_LIST_SHA256'}})
+
+    assert not app.download_missing_pickles()
+    assert requests_seen == []
+    assert not os.path.exists('movie_list.pkl')
@@ -0,0 +1,23 @@
+"""Recommendations for a watch history"""
+import numpy as np
+
+import app
+
+
+def test_rank_history_sums_weighted_neighbor_scores(model):
+    ids, totals = app.rank_history(model, [0, 1], weights=[1, 2])
+    assert ids.tolist() == [2, 5, 3]
+    assert np.allclose(totals, [1.6, 1.0, 0.4], atol=1e-3)
+
+
+def test_rank_history_never_returns_seeds_or_excluded_movies(model):
+    ids, _ = app.rank_history(model, [0, 1], exclude_indices=[5])
+    assert ids.tolist() == [2, 3]
+
+
+def test_rank_for_history_resolves_titles_and_pages(model):
+    seeds, exclude = ['movie 0', 'Movie 1'], ['Movie 5']
+    first, has_more = app.rank_for_history(model, seeds, [1, 2], exclude, k=1, page=0)
+    assert (first.tolist(), has_more) == ([2], True)
+    second, has_more = app.rank_for_history(model, seeds, [1, 2], exclude, k=1, page=1)
+    assert (second.tolist(), has_more) == ([3], False)
@@ -0,0 +1,54 @@
+"""The two-tier TMDB metadata cache"""
+import time
+
+import app
+
+
+def test_a_fresh_instance_reads_through_to_sqlite(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    app.MetadataCache(db_path=db_path).set(7, '/poster.jpg', 6.5)
+
+    cache = app.MetadataCache(db_path=db_path)
+    assert cache.get(7) == ('/poster.jpg', 6.5)
+    assert cache.get(7) == ('/poster.jpg', 6.5)
+    assert cache.summary() == {'memory_hits': 1, 'disk_hits': 1, 'negative_hits': 0, 'misses': 0, 'size': 1}
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = app.MetadataCache(ttl=0.05, db_path=str(tmp_path / 'cache.sqlite3'))
+    cache.set(7, '/poster.jpg', 6.5)
+    time.sleep(0.1)
+    assert cache.get(7) is None
+    assert cache.summary()['size'] == 0
+
+
+def test_failures_expire_sooner_than_successes():
+    cache = app.MetadataCache(ttl=60, negative_ttl=0.05, db_path=None)
+    cache.set(1, '/poster.jpg', 6.5)
+    cache.set(2, 'text=Error+Loading', 'N/A', negative=True)
+    assert cache.get(2) == ('text=Error+Loading', 'N/A')
+    time.sleep(0.1)
+    assert cache.get(1) == ('/poster.jpg', 6.5)
+    assert cache.get(2) is None
+
+
+def test_the_least_recently_used_entry_is_evicted_at_max_size():
+    cache = app.MetadataCache(max_size=2, db_path=None)
+    cache.set(1, '/1.jpg', 1.0)
+    cache.set(2, '/2.jpg', 2.0)
+    cache.get(1)
+    cache.set(3, '/3.jpg', 3.0)
+    assert cache.get(2) is None
+    assert cache.get(1) == ('/1.jpg', 1.0)
+    assert cache.get(3) == ('/3.jpg', 3.0)
+
+
+def test_hits_and_misses_are_counted():
+    cache = app.MetadataCache(db_path=None)
+    cache.set(1, '/1.jpg', 1.0)
+    cache.set(2, 'text=Error+Loading', 'N/A', negative=True)
+    cache.get(1)
+    cache.get(1)
+    cache.get(2)
+    cache.get(3)
+    assert cache.summary() == {'memory_hits': 2, 'disk_hits': 0, 'negative_hits': 1, 'misses': 1, 'size': 2}
@@ -0,0 +1,17 @@
+"""The Prometheus scrape endpoint"""
+import app
+
+
+def test_cache_tallies_are_counters_and_sizes_are_gauges(model, monkeypatch):
+    monkeypatch.setattr(app, 'metadata_cache', app.MetadataCache(db_path=None))
+    app.metadata_cache.set(1, '/1.jpg', 1.0)
+    app.metadata_cache.get(1)
+    app.metadata_cache.get(2)
+    text = app.app.test_client().get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE cineai_metadata_cache_memory_hits_total counter\ncineai_metadata_cache_memory_hits_total 1\n' in text
+    assert '# TYPE cineai_metadata_cache_misses_total counter\ncineai_metadata_cache_misses_total 1\n' in text
+    assert '# TYPE cineai_metadata_cache_size gauge\ncineai_metadata_cache_size 1\n' in text
+    assert '# TYPE cineai_response_cache_hits_total counter' in text
+    assert '# TYPE cineai_response_cache_size gauge' in text
+    assert 'cineai_metadata_cache_memory_hits ' not in text
@@ -0,0 +1,38 @@
+"""Top-K selection and the precomputed neighbor index"""
+import numpy as np
+
+import app
+from conftest import SIMILARITY
+
+
+def test_top_k_returns_the_largest_entries_best_first():
+    rows = np.array([[0.1, 0.9, 0.0, 0.5, 0.7],
+                     [0.3, 0.0, 0.8, 0.0, 0.2]], dtype=np.float32)
+    ids, scores = app.top_k(rows, 3)
+    assert ids.tolist() == [[1, 4, 3], [2, 0, 4]]
+    assert np.allclose(scores, [[0.9, 0.7, 0.5], [0.8, 0.3, 0.2]])
+
+
+def test_top_k_leaves_rows_alone_unless_asked_to_overwrite():
+    rows = np.array([[0.1, 0.9, 0.5]], dtype=np.float32)
+    before = rows.copy()
+    app.top_k(rows, 2)
+    assert np.array_equal(rows, before)
+    ids, _ = app.top_k(rows.copy(), 5, overwrite=True)
+    assert ids.tolist() == [[1, 2, 0]]
+
+
+def test_neighbor_index_never_recommends_a_movie_to_itself():
+    ids, scores = app.build_neighbor_index(SIMILARITY, k=10)
+    assert ids.shape == (6, 5)
+    assert not (ids == np.arange(6)[:, None]).any()
+    assert ids[0].tolist() == [1, 3, 5, 4, 2]
+    assert (np.diff(scores.astype(np.float32), axis=1) <= 0).all()
+
+
+def test_neighbor_index_is_the_same_whatever_the_chunk_size():
+    ids, scores = app.build_neighbor_index(SIMILARITY, k=3)
+    for chunk_size in (1, 4):
+        chunked_ids, chunked_scores = app.build_neighbor_index(SIMILARITY, k=3, chunk_size=chunk_size)
+        assert (chunked_ids == ids).all() and (chunked_scores == scores).all()
+    assert ids.dtype == np.int32 and scores.dtype == np.float16
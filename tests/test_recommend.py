@@ -0,0 +1,18 @@
+"""Single-title recommendations through /api/recommend"""
+import app
+
+
+def test_pages_stop_where_the_stored_neighbors_do(model):
+    client = app.app.test_client()
+    first = client.post('/api/recommend', json={'movie': 'Movie 0', 'k': 2}).get_json()
+    last = client.post('/api/recommend', json={'movie': 'Movie 0', 'k': 2, 'page': 1}).get_json()
+    assert first['has_more'] and not last['has_more']
+    assert len(first['recommendations']) + len(last['recommendations']) == 3
+
+    response = client.post('/api/recommend', json={'movie': 'Movie 0', 'k': 2, 'page': 100000})
+    assert response.status_code == 400
+
+
+def test_rank_movie_returns_nothing_past_the_stored_neighbors(model):
+    assert app.rank_movie(model, 'Movie 0', k=2, page=1).tolist() == [model.neighbor_ids[0, 2]]
+    assert len(app.rank_movie(model, 'Movie 0', k=2, page=2)) == 0
@@ -0,0 +1,42 @@
+"""Prepared responses: content-coding, per-encoding ETags and conditional GETs"""
+import gzip
+
+import app
+
+
+def test_each_encoding_gets_its_own_etag(model):
+    client = app.app.test_client()
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+
+
+def test_an_encoding_refused_with_q_zero_is_not_sent(model):
+    response = app.app.test_client().get('/', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_if_none_match_returns_304(model):
+    client = app.app.test_client()
+    for path in ('/api/movies?q=movie', '/'):
+        etag = client.get(path, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        response = client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+def test_a_gzip_etag_does_not_validate_the_identity_body(model):
+    client = app.app.test_client()
+    etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert client.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag}).status_code == 200
+
+
+def test_recommend_responses_carry_no_etag(model):
+    client = app.app.test_client()
+    for _ in range(2):
+        response = client.post('/api/recommend', json={'movie': 'Movie 0', 'k': 2})
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
@@ -0,0 +1,31 @@
+"""Title search ranking and normalization"""
+import app
+
+TITLES = ['Lone Star', 'Stardust', 'Star', 'Star Wars', 'Avatar']
+
+
+def test_search_ranks_exact_then_prefix_then_substring():
+    index = app.TitleIndex(TITLES)
+    results = [TITLES[i] for i in index.search('star')]
+    assert results[0] == 'Star'
+    assert set(results[1:3]) == {'Stardust', 'Star Wars'}
+    assert results[3:] == ['Lone Star']
+
+
+def test_search_ignores_case_and_spacing():
+    index = app.TitleIndex(TITLES)
+    assert TITLES[index.search('  STAR   wars ')[0]] == 'Star Wars'
+
+
+def test_search_respects_the_limit():
+    index = app.TitleIndex(TITLES)
+    assert [TITLES[i] for i in index.search('star', limit=1)] == ['Star']
+    assert index.search('star', limit=0) == []
+    assert index.search('') == []
+
+
+def test_resolve_prefers_an_exact_match_and_returns_none_for_no_match():
+    index = app.TitleIndex(TITLES)
+    assert index.resolve('star') == TITLES.index('Star')
+    assert index.resolve('lone') == TITLES.index('Lone Star')
+    assert index.resolve('zebra') is None
@@ -0,0 +1,29 @@
+"""TMDB enrichment against a stub server: posters, deadlines and placeholders"""
+import time
+
+import app
+
+
+def test_enrich_movies_returns_posters_and_ratings(tmdb):
+    tmdb()
+    results = app.enrich_movies([11, 12])
+    assert [poster for poster, _ in results] == ['https://image.tmdb.org/t/p/w500//11.jpg',
+                                                 'https://image.tmdb.org/t/p/w500//12.jpg']
+    assert [rating for _, rating in results] == [round(7.25, 1)] * 2
+
+
+def test_enrich_movies_returns_placeholders_at_the_deadline(tmdb):
+    tmdb(latency=1.0)
+    started = time.monotonic()
+    results = app.enrich_movies([21, 22], deadline=0.2)
+    assert time.monotonic() - started < 0.8
+    assert results == [('https://via.placeholder.com/500x750/1a1a1a/ffffff?text=Timed+Out', 'N/A')] * 2
+
+
+def test_stream_enrichment_yields_fast_lookups_first_and_times_out_the_rest(tmdb):
+    tmdb(latency=1.0, slow_ids=('32',))
+    results = list(app.stream_enrichment([31, 32, 33], deadline=0.3))
+    assert sorted(position for position, _, _ in results) == [0, 1, 2]
+    assert results[-1][0] == 1
+    assert results[-1][1].endswith('text=Timed+Out')
+    assert all(poster.endswith('.jpg') for _, poster, _ in results[:2])
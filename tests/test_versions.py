@@ -0,0 +1,63 @@
+"""Versioned artifacts: publishing, pruning and hot reloads"""
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+import app
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    """An empty artifacts root with sortable version ids and no model loaded"""
+    out_dir = str(tmp_path / 'artifacts')
+    counter = itertools.count(1)
+    monkeypatch.setattr(app, 'ARTIFACTS_DIR', out_dir)
+    monkeypatch.setattr(app, 'new_version_id', lambda: f'v{next(counter)}')
+    monkeypatch.setattr(app, 'active_model', None)
+    return out_dir
+
+
+def publish(out_dir, num_movies=4):
+    similarity = np.random.default_rng(num_movies).random((num_movies, num_movies), dtype=np.float32)
+    ids, scores = app.build_neighbor_index(similarity, k=2)
+    titles = [f'Movie {i}' for i in range(num_movies)]
+    return app.write_artifacts(out_dir, titles, np.arange(num_movies), ids, scores)['version']
+
+
+def test_reload_swaps_in_the_published_version(artifacts):
+    first = publish(artifacts)
+    assert app.resolve_artifact_dir(artifacts) == (first, os.path.join(artifacts, first))
+    assert app.reload_model().version == first
+
+    second = publish(artifacts, num_movies=5)
+    assert app.resolve_artifact_dir(artifacts)[0] == second
+    model = app.reload_model()
+    assert app.active_model is model
+    assert (model.version, len(model.movies)) == (second, 5)
+
+    assert app.reload_model(version=first).version == first
+    assert app.resolve_artifact_dir(artifacts)[0] == first
+
+
+def test_prune_keeps_the_current_version(artifacts):
+    versions = [publish(artifacts) for _ in range(3)]
+    app.set_current_version(artifacts, versions[0])
+    app.prune_versions(artifacts, keep=1)
+    assert app.list_versions(artifacts) == [versions[0], versions[2]]
+
+
+def test_admin_reload_rejects_unknown_versions(artifacts, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 's3cret')
+    version = publish(artifacts)
+    app.reload_model()
+    client = app.app.test_client()
+    headers = {'X-Admin-Token': 's3cret'}
+
+    assert client.post('/admin/reload', json={'version': version}, headers={'X-Admin-Token': 'guess'}).status_code == 403
+    assert client.post('/admin/reload', json={'version': 'v404'}, headers=headers).status_code == 404
+    assert client.post('/admin/reload', json={'version': '..'}, headers=headers).status_code == 404
+    assert client.post('/admin/reload', json={'version': f'../artifacts/{version}'}, headers=headers).status_code == 404
+    response = client.post('/admin/reload', json={'version': version, 'force': True}, headers=headers)
+    assert response.get_json()['model_version'] == version